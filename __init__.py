@@ -4,6 +4,12 @@ from .nodes.jimeng_t2i_v31_node import (
     BtJimengT2IV30Node,
     BtJimengT2IV40Node,
 )
+from .nodes.jimeng_t2i_batch_node import (
+    BtJimengT2IV31BatchNode,
+    BtJimengT2IV30BatchNode,
+    BtJimengT2IV40BatchNode,
+)
+from .nodes.liblib_node import BtLiblibT2INode
 from .btmiddleware import *
 
 # 检查并安装依赖
@@ -22,6 +28,10 @@ NODE_CLASS_MAPPINGS = {
     "BtJimengT2IV31Node": BtJimengT2IV31Node,
     "BtJimengT2IV30Node": BtJimengT2IV30Node,
     "BtJimengT2IV40Node": BtJimengT2IV40Node,
+    "BtJimengT2IV31BatchNode": BtJimengT2IV31BatchNode,
+    "BtJimengT2IV30BatchNode": BtJimengT2IV30BatchNode,
+    "BtJimengT2IV40BatchNode": BtJimengT2IV40BatchNode,
+    "BtLiblibT2INode": BtLiblibT2INode,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
@@ -29,6 +39,10 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "BtJimengT2IV31Node": "即梦文生图3.1",
     "BtJimengT2IV30Node": "即梦文生图3.0",
     "BtJimengT2IV40Node": "即梦文生图4.0",
+    "BtJimengT2IV31BatchNode": "即梦文生图3.1(批量)",
+    "BtJimengT2IV30BatchNode": "即梦文生图3.0(批量)",
+    "BtJimengT2IV40BatchNode": "即梦文生图4.0(批量)",
+    "BtLiblibT2INode": "LiblibAI文生图",
 }
 
 WEB_DIRECTORY = "./js"
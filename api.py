@@ -1,11 +1,20 @@
 from aiohttp import web
+import asyncio
 import logging
 from datetime import datetime
 from .database.manager import db_manager
+from .database.models.artifact import outputs_digest
+from .tracker import prompt_tracker, queue_snapshot, result_status_of
+from .notifier import artifact_notifier
+from .nodes.rate_limiter import limiter_stats
 import server
 prompt_server = server.PromptServer.instance
 routes = web.RouteTableDef()
 
+# 批量查询状态时一次最多的prompt数量，以及长轮询最长等待时间（秒）
+MAX_STATUS_PROMPTS = 500
+MAX_STATUS_WAIT = 30
+
 @routes.post('/bt/artifacts/list')
 async def handle_artifacts_list(request: web.Request):
     """处理历史记录列表请求"""
@@ -14,29 +23,66 @@ async def handle_artifacts_list(request: web.Request):
         data = await request.json()
         date = data.get('date', '')
         status = data.get('status', '')
+        # 时间范围：epoch秒或本地时间字符串，from包含、to不包含（只有日期时包含当天）
+        start = data.get('from')
+        end = data.get('to')
         limit = int(data.get('limit', 20))
         offset = int(data.get('offset', 0))
+        # 传入cursor字段（首页为空字符串）时使用游标分页，否则兼容旧的offset分页
+        cursor_mode = 'cursor' in data
+        cursor = data.get('cursor') or None
+        # view=summary 时只返回卡片需要的摘要字段，详情通过 /bt/artifacts/{id} 获取
+        summary = data.get('view') == 'summary'
+        # 全文检索关键词，检索结果按相关度排序，此时游标即偏移量
+        q = (data.get('q') or '').strip()
+        if q and cursor_mode:
+            offset = int(cursor) if cursor else 0
+            cursor = None
         
-        # 获取数据库记录
+        # 获取数据库记录（游标模式多取一条用于判断是否还有下一页）
         artifacts = db_manager.artifact.list_artifacts(
-            limit=limit,
+            limit=limit + 1 if cursor_mode else limit,
             offset=offset,
             date=date,
-            status=status
+            status=status,
+            cursor=cursor,
+            summary=summary,
+            q=q,
+            start=start,
+            end=end
         )
         
+        next_cursor = None
+        if cursor_mode and len(artifacts) > limit:
+            artifacts = artifacts[:limit]
+            if q:
+                next_cursor = str(offset + limit)
+            else:
+                next_cursor = db_manager.artifact.encode_cursor(artifacts[-1])
+        
         # 获取总数
-        total = db_manager.artifact.count_artifacts(date=date, status=status)
+        total = db_manager.artifact.count_artifacts(date=date, status=status, q=q, start=start, end=end)
+        
+        result = {
+            'list': artifacts,
+            'total': total,
+            'pageSize': limit
+        }
+        if cursor_mode:
+            result['next_cursor'] = next_cursor
+        else:
+            result['page'] = offset // limit + 1
         
         return web.json_response({
             'code': 0,
             'msg': 'success',
-            'data': {
-                'list': artifacts,
-                'total': total,
-                'page': offset // limit + 1,
-                'pageSize': limit
-            }
+            'data': result
+        })
+    except ValueError as e:
+        return web.json_response({
+            'code': 400,
+            'msg': str(e),
+            'data': None
         })
     except Exception as e:
         logging.error(f"获取历史记录失败: {str(e)}")
@@ -68,6 +114,8 @@ async def handle_artifact_delete(request: web.Request):
         
         # 删除记录
         result = db_manager.artifact.delete_artifact(id)
+        if result:
+            artifact_notifier.deleted(int(id))
 
         # 删除文件??先不清空了
         
@@ -91,29 +139,205 @@ async def handle_artifact_delete(request: web.Request):
             'data': None
         })
 
-# @routes.get('/bt/artifacts/{id}')
-# async def handle_artifact_detail(request: web.Request):
-#     """处理单条记录详情请求"""
-#     try:
-#         artifact_id = request.match_info['id']
-#         artifact = db_manager.artifact.get_artifact(artifact_id)
+@routes.get(r'/bt/artifacts/{id:\d+}')
+async def handle_artifact_detail(request: web.Request):
+    """处理单条记录详情请求"""
+    try:
+        artifact_id = int(request.match_info['id'])
+        artifact = db_manager.artifact.get_artifact(artifact_id)
         
-#         if not artifact:
-#             return web.json_response({
-#                 'code': 404,
-#                 'msg': '记录不存在',
-#                 'data': None
-#             })
+        if not artifact:
+            return web.json_response({
+                'code': 404,
+                'msg': '记录不存在',
+                'data': None
+            })
             
-#         return web.json_response({
-#             'code': 0,
-#             'msg': 'success',
-#             'data': artifact
-#         })
-#     except Exception as e:
-#         logging.error(f"获取记录详情失败: {str(e)}")
-#         return web.json_response({
-#             'code': 500,
-#             'msg': str(e),
-#             'data': None
-#         }) 
\ No newline at end of file
+        return web.json_response({
+            'code': 0,
+            'msg': 'success',
+            'data': artifact
+        })
+    except Exception as e:
+        logging.error(f"获取记录详情失败: {str(e)}")
+        return web.json_response({
+            'code': 500,
+            'msg': str(e),
+            'data': None
+        }) 
+
+@routes.get('/bt/artifacts/by-image')
+async def handle_artifact_by_image(request: web.Request):
+    """根据输出文件反查生成记录"""
+    try:
+        filename = request.query.get('filename', '')
+        if not filename:
+            return web.json_response({
+                'code': 400,
+                'msg': '缺少文件名',
+                'data': None
+            })
+        
+        artifact = db_manager.artifact.find_artifact_by_image(
+            filename,
+            subfolder=request.query.get('subfolder'),
+            image_type=request.query.get('type')
+        )
+        if not artifact:
+            return web.json_response({
+                'code': 404,
+                'msg': '记录不存在',
+                'data': None
+            })
+        
+        return web.json_response({
+            'code': 0,
+            'msg': 'success',
+            'data': artifact
+        })
+    except Exception as e:
+        logging.error(f"根据文件查询记录失败: {str(e)}")
+        return web.json_response({
+            'code': 500,
+            'msg': str(e),
+            'data': None
+        })
+
+
+def build_prompt_statuses(prompt_ids):
+    """批量查询prompt状态：已完成的从数据库读取，未完成的一次性对照队列和历史记录
+
+    状态：pending-排队中 running-执行中 success-成功 error-失败 unknown-未知
+    """
+    summaries = db_manager.artifact.get_summaries_by_prompt_ids(prompt_ids)
+    unfinished = [
+        prompt_id for prompt_id in prompt_ids
+        if summaries.get(prompt_id, {}).get('result_status') in (None, '0')
+    ]
+    running, pending, history = set(), set(), {}
+    if unfinished:
+        running, pending, history = queue_snapshot(prompt_server.prompt_queue, unfinished)
+
+    statuses = {}
+    for prompt_id in prompt_ids:
+        summary = summaries.get(prompt_id)
+        item = {
+            'prompt_id': prompt_id,
+            'artifact_id': summary['id'] if summary else None,
+            'state': 'unknown',
+            'images': [],
+        }
+        if summary and summary['result_status'] in ('1', '2'):
+            item['state'] = 'success' if summary['result_status'] == '1' else 'error'
+            item['images'] = summary['images']
+        elif prompt_id in history:
+            entry = history[prompt_id]
+            item['state'] = 'error' if result_status_of(entry.get('status')) == '2' else 'success'
+            item['images'] = [
+                {key: image[key] for key in ('node_id', 'filename', 'subfolder', 'type')}
+                for image in outputs_digest(entry.get('outputs') or {})
+            ]
+        elif prompt_id in running:
+            item['state'] = 'running'
+        elif prompt_id in pending:
+            item['state'] = 'pending'
+        statuses[prompt_id] = item
+    return statuses
+
+@routes.post('/bt/api/prompt/status')
+async def handle_prompt_status(request: web.Request):
+    """批量查询prompt状态，可选长轮询直到任一状态变化"""
+    try:
+        data = await request.json()
+        prompt_ids = [str(prompt_id) for prompt_id in (data.get('prompt_ids') or [])]
+        prompt_ids = list(dict.fromkeys(prompt_ids))
+        if not prompt_ids:
+            return web.json_response({
+                'code': 400,
+                'msg': '缺少prompt_ids',
+                'data': None
+            })
+        if len(prompt_ids) > MAX_STATUS_PROMPTS:
+            return web.json_response({
+                'code': 400,
+                'msg': f'prompt_ids最多{MAX_STATUS_PROMPTS}个',
+                'data': None
+            })
+        # wait>0时长轮询：直到某个prompt的状态与known（未传时为本次请求开始时的状态）不同
+        wait = min(max(float(data.get('wait') or 0), 0), MAX_STATUS_WAIT)
+        known = data.get('known')
+        if not isinstance(known, dict):
+            known = {}
+
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        wanted = set(prompt_ids)
+        # 跟踪器报告有变化、需要重新查询的prompt
+        dirty = set()
+
+        def mark(prompt_id):
+            dirty.add(prompt_id)
+            changed.set()
+
+        def on_change(prompt_id, state):
+            if prompt_id in wanted:
+                loop.call_soon_threadsafe(mark, prompt_id)
+
+        prompt_tracker.subscribe(on_change)
+        try:
+            deadline = loop.time() + wait
+            # 数据库读取是同步的，放到线程池执行，避免阻塞ComfyUI的事件循环
+            statuses = await loop.run_in_executor(None, build_prompt_statuses, prompt_ids)
+            baseline = {
+                prompt_id: known.get(prompt_id) or statuses[prompt_id]['state']
+                for prompt_id in prompt_ids
+            }
+            while True:
+                is_changed = any(statuses[prompt_id]['state'] != baseline[prompt_id] for prompt_id in prompt_ids)
+                remaining = deadline - loop.time()
+                if is_changed or remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                changed.clear()
+                # 只重新查询有变化的prompt
+                updated_ids = [prompt_id for prompt_id in prompt_ids if prompt_id in dirty]
+                dirty.clear()
+                if updated_ids:
+                    statuses.update(await loop.run_in_executor(None, build_prompt_statuses, updated_ids))
+        finally:
+            prompt_tracker.unsubscribe(on_change)
+
+        return web.json_response({
+            'code': 0,
+            'msg': 'success',
+            'data': {
+                'list': [statuses[prompt_id] for prompt_id in prompt_ids],
+                'changed': is_changed
+            }
+        })
+    except (ValueError, TypeError) as e:
+        return web.json_response({
+            'code': 400,
+            'msg': str(e),
+            'data': None
+        })
+    except Exception as e:
+        logging.error(f"批量查询prompt状态失败: {str(e)}")
+        return web.json_response({
+            'code': 500,
+            'msg': str(e),
+            'data': None
+        })
+
+
+@routes.get('/bt/api/rate-limits')
+async def handle_rate_limits(request: web.Request):
+    """远程服务限流器的计数：等待并发名额(queued)、等待令牌(waiting)、执行中、已完成、被限流次数"""
+    return web.json_response({
+        'code': 0,
+        'msg': 'success',
+        'data': limiter_stats()
+    })
@@ -0,0 +1,210 @@
+"""即梦节点端到端基准测试（不是单元测试）
+
+启动本地替身服务（fake_volc_server.py），在多个线程中并发调用 BtJimengT2IBaseNode.generate，
+并调用批量节点 generate_batch，统计延迟p50/p99、吞吐、错误数和峰值内存。
+节点依赖torch和ComfyUI的server模块，需要在ComfyUI的Python环境中运行，--comfyui 指向ComfyUI根目录
+（默认为插件所在的 custom_nodes 的上一级）：
+
+    python bench/bench_jimeng.py --requests 50 --concurrency 8 --payload url --image-size 2048
+    python bench/bench_jimeng.py --scenario batch --batch-size 40 --throttle-qps 5 --json bench_output.json
+
+结果缓存始终关闭（use_cache=False），每次调用都会真实经过替身服务。
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+from common import ACCESS_KEY, PLUGIN_DIR, REGION, SECRET_KEY, SERVICE, import_plugin, setup_comfyui
+from fake_volc_server import FakeVolcServer, add_config_arguments, config_from_args
+
+SCENARIOS = ["single", "batch", "all"]
+
+
+class ServerThread:
+    """在独立线程的事件循环中运行替身服务，与节点共享的HTTP事件循环互不影响"""
+
+    def __init__(self, config):
+        self.server = FakeVolcServer(config)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="bench-fake-volc", daemon=True)
+
+    def start(self) -> str:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+        return self.server.url
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        return dict(self.server.stats)
+
+
+def percentile(values, pct):
+    """最近秩百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def max_rss_mb() -> float:
+    # Linux下ru_maxrss单位为KB，macOS为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def summarize(name, latencies_ms, errors, wall_s, images, server_before, server_after, peak_bytes):
+    server = {key: server_after[key] - server_before.get(key, 0) for key in server_after}
+    return {
+        "scenario": name,
+        "requests": len(latencies_ms) + len(errors),
+        "success": len(latencies_ms),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "images": images,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(latencies_ms) / wall_s, 2) if wall_s else None,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p99_ms": percentile(latencies_ms, 99),
+        "max_ms": max(latencies_ms) if latencies_ms else None,
+        "peak_traced_mb": round(peak_bytes / (1024 * 1024), 1),
+        "max_rss_mb": round(max_rss_mb(), 1),
+        "server": server,
+    }
+
+
+def run_single(node, args, server):
+    """并发调用单任务节点，每次调用的延迟为generate的耗时"""
+    def call(index):
+        started = time.perf_counter()
+        batch, result = node.generate(
+            f"bench prompt {index}", args.width, args.height, index, True,
+            args.poll_interval_ms, args.poll_timeout_ms, args.return_url, use_cache=False,
+        )
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+        try:
+            images = json.loads(result).get("image_count", 0)
+        except (json.JSONDecodeError, AttributeError):
+            return None, result, 0
+        return elapsed_ms, None, images
+
+    before = server.stats()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(executor.map(call, range(args.requests)))
+    wall_s = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    return summarize(
+        "single",
+        [elapsed for elapsed, _, _ in outcomes if elapsed is not None],
+        [error for _, error, _ in outcomes if error is not None],
+        wall_s, sum(images for _, _, images in outcomes), before, server.stats(), peak,
+    )
+
+
+def run_batch(node, args, server):
+    """调用批量节点，每个任务的延迟为从开始到该任务完成（含下载解码）的耗时"""
+    prompts = "\n".join(f"bench batch prompt {index}" for index in range(args.batch_size))
+    seeds = ",".join(str(index) for index in range(args.batch_size))
+    before = server.stats()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    batch, result = node.generate_batch(
+        prompts, seeds, args.width, args.height, True, args.submit_qps,
+        args.poll_interval_ms, args.poll_timeout_ms, args.return_url, use_cache=False,
+    )
+    wall_s = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    try:
+        result = json.loads(result)
+    except json.JSONDecodeError:
+        return summarize("batch", [], [result] * args.batch_size, wall_s, 0, before, server.stats(), peak)
+    items = result.get("items", [])
+    return summarize(
+        "batch",
+        [item["elapsed_ms"] for item in items if not item.get("error")],
+        [item["error"] for item in items if item.get("error")],
+        wall_s, result.get("image_count", 0), before, server.stats(), peak,
+    )
+
+
+def print_report(reports) -> None:
+    columns = ["scenario", "requests", "success", "errors", "images", "wall_s", "throughput_rps",
+               "p50_ms", "p99_ms", "max_ms", "peak_traced_mb", "max_rss_mb"]
+    rows = [[str(report[column]) for column in columns] for report in reports]
+    widths = [max(len(column), *(len(row[index]) for row in rows)) for index, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+    for report in reports:
+        print(f"[{report['scenario']}] server: {report['server']}")
+        for error in report["error_samples"]:
+            print(f"[{report['scenario']}] error: {error}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="即梦节点端到端基准测试")
+    parser.add_argument("--comfyui", default=os.path.dirname(os.path.dirname(PLUGIN_DIR)), help="ComfyUI根目录")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="all")
+    parser.add_argument("--requests", type=int, default=20, help="single场景的调用次数")
+    parser.add_argument("--concurrency", type=int, default=4, help="single场景同时调用的线程数")
+    parser.add_argument("--batch-size", type=int, default=20, help="batch场景的任务数")
+    parser.add_argument("--submit-qps", type=float, default=10.0, help="batch场景的提交QPS")
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--poll-interval-ms", type=int, default=200)
+    parser.add_argument("--poll-timeout-ms", type=int, default=120000)
+    parser.add_argument("--return-url", action="store_true", help="请求时设置return_url")
+    parser.add_argument("--client-qps", type=float, default=0, help="节点侧限流QPS（BtArtifactGround.volc.qps），0为不限")
+    parser.add_argument("--client-concurrent", type=int, default=0, help="节点侧并发上限，0为不限")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    server = ServerThread(config_from_args(args))
+    settings = {
+        "BtArtifactGround.volc.accessKeyId": ACCESS_KEY,
+        "BtArtifactGround.volc.secretAccessKey": SECRET_KEY,
+        "BtArtifactGround.volc.region": REGION,
+        "BtArtifactGround.volc.service": SERVICE,
+        "BtArtifactGround.volc.qps": args.client_qps,
+        "BtArtifactGround.volc.concurrent": args.client_concurrent,
+    }
+    setup_comfyui(args.comfyui, settings)
+    single_module = import_plugin("nodes.jimeng_t2i_v31_node")
+    batch_module = import_plugin("nodes.jimeng_t2i_batch_node")
+
+    settings["BtArtifactGround.volc.endpoint"] = server.start()
+    tracemalloc.start()
+    reports = []
+    try:
+        if args.scenario in ("single", "all"):
+            reports.append(run_single(single_module.BtJimengT2IV31Node(), args, server))
+        if args.scenario in ("batch", "all"):
+            reports.append(run_batch(batch_module.BtJimengT2IV31BatchNode(), args, server))
+    finally:
+        tracemalloc.stop()
+        server.stop()
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "reports": reports}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
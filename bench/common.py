@@ -0,0 +1,49 @@
+"""基准测试的公共部分：以包的形式导入插件模块，以及在ComfyUI进程外运行节点所需的设置"""
+import importlib
+import os
+import sys
+import types
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 插件目录名含"-"不能直接导入，以这个包名加载插件的子模块（不执行插件的__init__.py）
+PACKAGE = "bt_artifact_ground"
+
+# 替身服务使用的凭证和签名参数
+ACCESS_KEY = "AKLTbench0000"
+SECRET_KEY = "bench-secret"
+REGION = "cn-north-1"
+SERVICE = "cv"
+
+
+def import_plugin(module: str):
+    """导入插件的子模块，如 import_plugin("nodes.volc_signer")"""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [PLUGIN_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+
+class StaticSettings:
+    """代替ComfyUI用户设置，节点通过 user_settings.get_settings(request) 读取"""
+
+    def __init__(self, values: dict):
+        self.values = values
+
+    def get_settings(self, request):
+        return self.values
+
+
+def setup_comfyui(comfyui_dir: str, settings: dict) -> None:
+    """把ComfyUI根目录加入sys.path
+
+    在ComfyUI进程外 PromptServer.instance 为空，节点模块导入时需要从它读取用户设置，这里用固定的设置代替。
+    """
+    comfyui_dir = os.path.abspath(comfyui_dir)
+    if comfyui_dir not in sys.path:
+        sys.path.insert(0, comfyui_dir)
+    import server
+    if getattr(server.PromptServer, "instance", None) is None:
+        server.PromptServer.instance = types.SimpleNamespace(
+            user_manager=types.SimpleNamespace(settings=StaticSettings(settings))
+        )
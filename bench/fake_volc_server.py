@@ -0,0 +1,275 @@
+"""即梦（火山引擎视觉服务）异步接口的本地替身
+
+实现 CVSync2AsyncSubmitTask / CVSync2AsyncGetResult 并校验签名，可配置排队和生成耗时、提交失败率、
+服务端限流（HTTP 429 + Retry-After，错误码50429）以及base64或URL两种图片返回方式。
+既可以单独运行，也可以在基准测试中通过 FakeVolcServer 启动：
+
+    python bench/fake_volc_server.py --port 18080 --queue-delay 2 --payload url
+
+单独运行时节点使用的凭证见 common.py 中的 ACCESS_KEY/SECRET_KEY。
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import io
+import json
+import logging
+import random
+import time
+import urllib.parse
+import uuid
+
+import numpy as np
+from aiohttp import web
+from PIL import Image
+
+from common import ACCESS_KEY, REGION, SECRET_KEY, SERVICE
+
+
+def verify_signature(method: str, path: str, query, headers, body: bytes) -> bool:
+    """按火山引擎 HMAC-SHA256 签名规范校验请求
+
+    独立于插件的 VolcSigner 实现：从请求实际收到的查询参数和请求头重建规范请求，
+    签名头列表取自Authorization，避免用被测代码校验被测代码。
+    """
+    try:
+        algorithm, fields = headers.get("Authorization", "").split(" ", 1)
+        fields = dict(field.strip().split("=", 1) for field in fields.split(","))
+        access_key, date_stamp, region, service, terminator = fields["Credential"].split("/")
+        signed_headers = fields["SignedHeaders"]
+        signature = fields["Signature"]
+    except (ValueError, KeyError):
+        return False
+    x_date = headers.get("X-Date", "")
+    names = signed_headers.split(";")
+    if (algorithm != "HMAC-SHA256" or access_key != ACCESS_KEY or region != REGION or service != SERVICE
+            or terminator != "request" or date_stamp != x_date[:8] or "host" not in names or "x-date" not in names):
+        return False
+    payload_hash = hashlib.sha256(body).hexdigest()
+    if headers.get("X-Content-Sha256", payload_hash) != payload_hash:
+        return False
+
+    quote = lambda value: urllib.parse.quote(value, safe="-_.~")
+    canonical_query = "&".join(f"{quote(key)}={quote(query[key])}" for key in sorted(query.keys()))
+    canonical_headers = "".join(f"{name}:{headers.get(name, '').strip()}\n" for name in names)
+    canonical_request = "\n".join([method, path, canonical_query, canonical_headers, signed_headers, payload_hash])
+    string_to_sign = "\n".join([
+        algorithm, x_date, f"{date_stamp}/{region}/{service}/{terminator}",
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    key = SECRET_KEY.encode("utf-8")
+    for part in (date_stamp, region, service, terminator):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    expected = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+
+class FakeVolcConfig:
+    def __init__(self, queue_delay: float = 1.0, generate_delay: float = 1.0, jitter: float = 0.2,
+                 failure_rate: float = 0.0, throttle_qps: float = 0, retry_after: float = 1.0,
+                 payload: str = "base64", image_count: int = 1, image_size: int = 1024):
+        # 排队和生成的平均耗时（秒），每个任务按jitter比例随机浮动
+        self.queue_delay = queue_delay
+        self.generate_delay = generate_delay
+        self.jitter = jitter
+        # 提交任务时返回内部错误的概率
+        self.failure_rate = failure_rate
+        # 服务端每秒允许的请求数，0为不限流；被限流时Retry-After的秒数
+        self.throttle_qps = throttle_qps
+        self.retry_after = retry_after
+        # 图片返回方式：base64 或 url（请求的req_json中return_url为true时也返回url）
+        self.payload = payload
+        self.image_count = image_count
+        self.image_size = image_size
+
+
+class FakeVolcServer:
+    def __init__(self, config: FakeVolcConfig):
+        self.config = config
+        self.tasks = {}
+        self.stats = {"submit": 0, "query": 0, "download": 0, "failed": 0, "throttled": 0, "rejected": 0}
+        self._images = []
+        self._images_base64 = []
+        self._tokens = float(max(1.0, config.throttle_qps))
+        self._updated = time.monotonic()
+        self._runner = None
+        self.port = None
+        self.app = web.Application()
+        self.app.router.add_post("/", self.handle_api)
+        self.app.router.add_get("/images/{task_id}/{index}.png", self.handle_image)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _prepare_images(self) -> None:
+        """预先生成随机噪声PNG（接近真实图片的大小，不可压缩）"""
+        size = self.config.image_size
+        rng = np.random.default_rng(0)
+        for _ in range(self.config.image_count):
+            pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+            buffer = io.BytesIO()
+            Image.fromarray(pixels).save(buffer, format="PNG", compress_level=1)
+            data = buffer.getvalue()
+            self._images.append(data)
+            self._images_base64.append(base64.b64encode(data).decode("ascii"))
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._prepare_images)
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @staticmethod
+    def _error(status: int, code: int, message: str, headers: dict = None):
+        return web.json_response(
+            {"code": code, "message": message, "data": None, "request_id": uuid.uuid4().hex},
+            status=status, headers=headers,
+        )
+
+    def _take_token(self) -> bool:
+        if not self.config.throttle_qps:
+            return True
+        now = time.monotonic()
+        qps = self.config.throttle_qps
+        self._tokens = min(max(1.0, qps), self._tokens + (now - self._updated) * qps)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _delay(self, mean: float) -> float:
+        return max(0.0, mean * random.uniform(1 - self.config.jitter, 1 + self.config.jitter))
+
+    async def handle_api(self, request: web.Request):
+        body = await request.read()
+        if not verify_signature(request.method, request.path, dict(request.query), request.headers, body):
+            self.stats["rejected"] += 1
+            return self._error(401, 50400, "Access Denied: signature mismatch")
+        if not self._take_token():
+            self.stats["throttled"] += 1
+            return self._error(429, 50429, "Request Has Reached API Limit, Please Try Later",
+                               headers={"Retry-After": str(self.config.retry_after)})
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            return self._error(400, 50411, "Invalid JSON")
+
+        action = request.query.get("Action")
+        if action == "CVSync2AsyncSubmitTask":
+            return self._submit(payload)
+        if action == "CVSync2AsyncGetResult":
+            return self._get_result(request, payload)
+        return self._error(400, 50400, f"Unknown Action: {action}")
+
+    def _submit(self, payload: dict):
+        self.stats["submit"] += 1
+        if not payload.get("req_key") or not payload.get("prompt"):
+            return self._error(400, 50411, "req_key and prompt are required")
+        if random.random() < self.config.failure_rate:
+            self.stats["failed"] += 1
+            return self._error(500, 50500, "Internal Error")
+        now = time.monotonic()
+        queued_until = now + self._delay(self.config.queue_delay)
+        task_id = uuid.uuid4().hex
+        self.tasks[task_id] = {
+            "queued_until": queued_until,
+            "done_at": queued_until + self._delay(self.config.generate_delay),
+        }
+        return web.json_response({
+            "code": 10000, "message": "Success", "request_id": uuid.uuid4().hex,
+            "data": {"task_id": task_id},
+        })
+
+    def _get_result(self, request: web.Request, payload: dict):
+        self.stats["query"] += 1
+        task_id = payload.get("task_id")
+        task = self.tasks.get(task_id)
+        data = {"status": "not_found"}
+        if task is not None:
+            now = time.monotonic()
+            if now < task["queued_until"]:
+                data = {"status": "in_queue"}
+            elif now < task["done_at"]:
+                data = {"status": "generating"}
+            else:
+                data = {"status": "done"}
+                try:
+                    return_url = json.loads(payload.get("req_json") or "{}").get("return_url")
+                except (json.JSONDecodeError, AttributeError):
+                    return_url = False
+                if self.config.payload == "url" or return_url:
+                    data["image_urls"] = [
+                        f"http://{request.host}/images/{task_id}/{index}.png" for index in range(len(self._images))
+                    ]
+                else:
+                    data["binary_data_base64"] = list(self._images_base64)
+        return web.json_response({
+            "code": 10000, "message": "Success", "request_id": uuid.uuid4().hex, "data": data,
+        })
+
+    async def handle_image(self, request: web.Request):
+        self.stats["download"] += 1
+        if request.match_info["task_id"] not in self.tasks:
+            raise web.HTTPNotFound()
+        index = int(request.match_info["index"])
+        if index >= len(self._images):
+            raise web.HTTPNotFound()
+        return web.Response(body=self._images[index], content_type="image/png")
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--queue-delay", type=float, default=1.0, help="平均排队耗时（秒）")
+    parser.add_argument("--generate-delay", type=float, default=1.0, help="平均生成耗时（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2, help="耗时随机浮动比例")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="提交失败的概率")
+    parser.add_argument("--throttle-qps", type=float, default=0, help="服务端限流QPS，0为不限流")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="限流响应的Retry-After秒数")
+    parser.add_argument("--payload", choices=["base64", "url"], default="base64", help="图片返回方式")
+    parser.add_argument("--image-count", type=int, default=1, help="每个任务返回的图片数")
+    parser.add_argument("--image-size", type=int, default=1024, help="图片边长")
+
+
+def config_from_args(args) -> FakeVolcConfig:
+    return FakeVolcConfig(
+        queue_delay=args.queue_delay, generate_delay=args.generate_delay, jitter=args.jitter,
+        failure_rate=args.failure_rate, throttle_qps=args.throttle_qps, retry_after=args.retry_after,
+        payload=args.payload, image_count=args.image_count, image_size=args.image_size,
+    )
+
+
+async def _serve(args) -> None:
+    server = FakeVolcServer(config_from_args(args))
+    await server.start(args.host, args.port)
+    logging.info(f"即梦替身服务已启动: {server.url}  AccessKey={ACCESS_KEY} SecretKey={SECRET_KEY}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="即梦异步接口的本地替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,154 @@
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# 等待数据库锁的最长时间（毫秒）
+BUSY_TIMEOUT_MS = 5000
+# 写连接池大小：SQLite同一时刻只允许一个写事务，进程内串行化可避免锁冲突
+WRITE_POOL_SIZE = 1
+# 只读连接池大小：WAL模式下读不阻塞写，可以并发
+READ_POOL_SIZE = 4
+
+# 每个连接都要设置的PRAGMA
+CONNECTION_PRAGMAS = (
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous=NORMAL",      # WAL模式下NORMAL已可保证一致性
+    "PRAGMA cache_size=-16000",       # 页缓存约16MB
+    "PRAGMA mmap_size=268435456",     # 内存映射256MB，减少读盘拷贝
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class ConnectionPool:
+    """有界的SQLite连接池
+
+    连接可跨线程复用（check_same_thread=False），但同一时刻只会被一个使用者持有。
+    """
+
+    def __init__(self, db_path: str, size: int, readonly: bool = False):
+        self.db_path = db_path
+        self.size = size
+        self.readonly = readonly
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        timeout = BUSY_TIMEOUT_MS / 1000
+        if self.readonly:
+            uri = f"{Path(self.db_path).as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=False)
+            conn.execute("PRAGMA query_only=1")
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=timeout, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """取出一个连接，池满时阻塞等待"""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False) -> None:
+        """归还连接；discard为True或连接池已关闭时直接关闭连接"""
+        try:
+            if discard or self._closed:
+                conn.close()
+            else:
+                self._idle.put_nowait(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """关闭所有空闲连接，正在使用的连接归还时关闭"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
 
 class BaseDB:
-    def __init__(self):
-        # 获取插件目录路径
-        plugin_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-        # 在插件目录下创建data目录
-        data_dir = os.path.join(plugin_dir, "data")
-        os.makedirs(data_dir, exist_ok=True)
-        # 设置数据库文件路径
-        self.db_path = os.path.join(data_dir, "artifacts.db")
-        
-    def get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path) 
\ No newline at end of file
+    def __init__(self, db_path: str = None):
+        """
+        Args:
+            db_path: 数据库文件路径，默认为插件目录下的 data/artifacts.db
+        """
+        if db_path is None:
+            # 获取插件目录路径
+            plugin_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+            # 在插件目录下创建data目录
+            data_dir = os.path.join(plugin_dir, "data")
+            os.makedirs(data_dir, exist_ok=True)
+            # 设置数据库文件路径
+            db_path = os.path.join(data_dir, "artifacts.db")
+        self.db_path = db_path
+        self._write_pool = ConnectionPool(self.db_path, WRITE_POOL_SIZE)
+        self._read_pool = ConnectionPool(self.db_path, READ_POOL_SIZE, readonly=True)
+        self._enable_wal()
+
+    def _enable_wal(self) -> None:
+        """开启WAL日志模式（持久化在数据库文件中，只需设置一次）"""
+        conn = self._write_pool.acquire()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            self._write_pool.release(conn)
+
+    @contextmanager
+    def get_connection(self):
+        """获取写连接
+
+        退出with块时自动提交，发生异常时回滚，随后连接归还连接池。
+        """
+        conn = self._write_pool.acquire()
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                discard = True
+            self._on_rollback()
+            raise
+        finally:
+            self._write_pool.release(conn, discard=discard)
+
+    def _on_rollback(self) -> None:
+        """写事务回滚后调用，子类可在这里丢弃与未提交数据相关的缓存"""
+        pass
+
+    @contextmanager
+    def get_read_connection(self):
+        """获取只读连接，用于列表、统计等查询"""
+        conn = self._read_pool.acquire()
+        discard = False
+        try:
+            yield conn
+        except sqlite3.Error:
+            discard = True
+            raise
+        finally:
+            if not discard and conn.in_transaction:
+                conn.rollback()
+            self._read_pool.release(conn, discard=discard)
+
+    def close(self) -> None:
+        """关闭连接池"""
+        self._write_pool.close()
+        self._read_pool.close()
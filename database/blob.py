@@ -0,0 +1,102 @@
+import hashlib
+import json
+import zlib
+
+# 压缩方式，写入blob表的codec列，便于以后扩展
+CODEC_ZLIB = 'zlib'
+ZLIB_LEVEL = 6
+
+
+def canonical_json(doc) -> str:
+    """规范化JSON：键排序、无多余空白，相同内容得到相同文本"""
+    return json.dumps(doc, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def content_hash(text: str) -> str:
+    """内容哈希，作为blob主键"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compress(text: str, codec: str = CODEC_ZLIB) -> bytes:
+    if codec != CODEC_ZLIB:
+        raise ValueError(f"不支持的压缩方式: {codec}")
+    return zlib.compress(text.encode('utf-8'), ZLIB_LEVEL)
+
+
+def decompress(data: bytes, codec: str = CODEC_ZLIB) -> str:
+    if codec != CODEC_ZLIB:
+        raise ValueError(f"不支持的压缩方式: {codec}")
+    return zlib.decompress(data).decode('utf-8')
+
+
+def document_family(doc) -> str:
+    """文档所属的族，同一族的文档以族内最新的blob为基准保存差量
+
+    prompt 为 [number, prompt_id, 节点图, extra_data, outputs] 列表（ComfyUI历史中为元组），按节点ID和节点类型归族，
+    只改了种子等参数的批量任务会落在同一族；其他文档按完整内容归族。
+    """
+    if isinstance(doc, (list, tuple)) and len(doc) > 2 and isinstance(doc[2], dict):
+        topology = {
+            node_id: node.get('class_type') if isinstance(node, dict) else None
+            for node_id, node in doc[2].items()
+        }
+        return content_hash(canonical_json(['prompt', topology]))
+    return content_hash(canonical_json(doc))
+
+
+def _same(old, new) -> bool:
+    # 避免 1 == True、1 == 1.0 这类跨类型相等被当成没有变化
+    return type(old) is type(new) and old == new
+
+
+def json_diff(old, new):
+    """计算把old变成new的补丁，没有差异时返回None
+
+    补丁格式：
+        {"v": 值}                         整体替换
+        {"o": {键: 子补丁}, "x": [键]}    对象：修改/新增的键，以及删除的键
+        {"l": {"下标": 子补丁}}            等长数组：修改的元素
+    """
+    if _same(old, new):
+        return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = {}
+        for key, value in new.items():
+            if key not in old:
+                changes[key] = {'v': value}
+            else:
+                sub = json_diff(old[key], value)
+                if sub is not None:
+                    changes[key] = sub
+        removed = [key for key in old if key not in new]
+        patch = {'o': changes}
+        if removed:
+            patch['x'] = removed
+        return patch
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        changes = {}
+        for index, (a, b) in enumerate(zip(old, new)):
+            sub = json_diff(a, b)
+            if sub is not None:
+                changes[str(index)] = sub
+        return {'l': changes}
+    return {'v': new}
+
+
+def json_patch(doc, patch):
+    """把json_diff生成的补丁应用到doc上，返回新文档（doc本身不被修改）"""
+    if patch is None:
+        return doc
+    if 'v' in patch:
+        return patch['v']
+    if 'o' in patch:
+        result = dict(doc)
+        for key in patch.get('x', []):
+            result.pop(key, None)
+        for key, sub in patch['o'].items():
+            result[key] = json_patch(result.get(key), sub)
+        return result
+    result = list(doc)
+    for index, sub in patch['l'].items():
+        result[int(index)] = json_patch(result[int(index)], sub)
+    return result
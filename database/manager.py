@@ -1,9 +1,34 @@
+import atexit
+import logging
 from .models import ArtifactDB
+from .writer import ArtifactWriter
+
+
+def _notify_migration(message: str, title: str, type: str = "info", timeout_millis: int = 3000) -> None:
+    """把数据库升级进度推送到前端"""
+    try:
+        from ..tool import command_ui_toast
+    except ImportError:
+        logging.info(f"[Bt-ArtifactGround] {title}: {message}")
+        return
+    command_ui_toast(message, title, type, timeout_millis)
+
 
 class DBManager:
     def __init__(self):
         self.artifact = ArtifactDB()
-        self.artifact.init_db()
+        # 结构迁移同步执行，耗时的回填在后台线程中分批执行，不阻塞启动
+        self.artifact.init_db(notify=_notify_migration)
+        self.artifact.start_migrations()
+        # 异步写入队列，请求处理和事件循环中的写入都走这里
+        self.writer = ArtifactWriter(self.artifact)
+        self.writer.start()
+
+    def close(self):
+        """落盘剩余写入并关闭数据库连接"""
+        self.writer.stop()
+        self.artifact.close()
 
 # 创建全局数据库管理器实例
-db_manager = DBManager() 
\ No newline at end of file
+db_manager = DBManager()
+atexit.register(db_manager.close)
@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+
+# 两批回填之间让出写连接的时间（秒），避免长时间占住写锁
+BACKFILL_PAUSE = 0.01
+# 回填进度提示的最小间隔（秒）
+PROGRESS_INTERVAL = 10
+
+# 记录各版本回填进度的表
+MIGRATION_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS comfyui_bt_migration (
+        version INTEGER PRIMARY KEY,  -- 数据库版本
+        name TEXT NOT NULL,           -- 迁移名称
+        last_id INTEGER DEFAULT 0,    -- 回填处理到的记录ID
+        done INTEGER DEFAULT 0,       -- 回填是否完成
+        updated_at DATETIME
+    )
+'''
+
+
+class Migration:
+    """一个数据库版本
+
+    upgrade(conn) 在启动时同步执行，只做建表、加列这类很快的结构变更，与 user_version 在同一事务中提交；
+    backfill(db, conn, last_id) 在后台线程中分批执行，每次处理一批并返回处理到的记录ID，
+    没有更多数据时返回None，每批与进度在同一事务中提交，重启后从断点继续；
+    finish(conn) 在回填完成后执行，如建索引。
+    """
+
+    def __init__(self, version: int, name: str, description: str, upgrade,
+                 backfill=None, finish=None):
+        self.version = version
+        self.name = name
+        self.description = description
+        self.upgrade = upgrade
+        self.backfill = backfill
+        self.finish = finish
+
+    @property
+    def has_background(self) -> bool:
+        return self.backfill is not None or self.finish is not None
+
+
+class MigrationRunner:
+    """按 PRAGMA user_version 依次执行迁移
+
+    结构变更在 upgrade() 中同步完成；耗时的回填和建索引由 start() 启动的后台线程按版本顺序分批执行，
+    未完成的迁移名称保存在 pending 中，查询可据此退化到不依赖新结构的方式。
+    """
+
+    def __init__(self, db, migrations, id_table: str, notify=None):
+        self.db = db
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        # 回填按这个表的记录ID推进，用于估算进度
+        self.id_table = id_table
+        # notify(message, title, type) 用于向前端报告进度
+        self.notify = notify
+        self.pending = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def latest_version(self) -> int:
+        return self.migrations[-1].version if self.migrations else 0
+
+    def is_pending(self, name: str) -> bool:
+        return name in self.pending
+
+    def upgrade(self) -> int:
+        """同步执行所有未执行的结构变更
+
+        Returns:
+            int: 升级后的数据库版本
+        """
+        with self.db.get_connection() as conn:
+            conn.execute(MIGRATION_TABLE_SQL)
+            current = conn.execute('PRAGMA user_version').fetchone()[0]
+        if current > self.latest_version:
+            logging.warning(f"[Bt-ArtifactGround] 数据库版本{current}高于插件支持的版本{self.latest_version}，跳过迁移")
+
+        for migration in self.migrations:
+            if migration.version <= current:
+                continue
+            with self.db.get_connection() as conn:
+                # 显式开启事务，让DDL、回填登记和版本号一起提交
+                conn.execute('BEGIN IMMEDIATE')
+                migration.upgrade(conn)
+                if migration.has_background:
+                    conn.execute('''
+                        INSERT OR REPLACE INTO comfyui_bt_migration (version, name, last_id, done, updated_at)
+                        VALUES (?, ?, 0, 0, datetime('now', 'localtime'))
+                    ''', (migration.version, migration.name))
+                conn.execute(f'PRAGMA user_version = {int(migration.version)}')
+            current = migration.version
+            logging.info(f"[Bt-ArtifactGround] 数据库已升级到版本{current}: {migration.description}")
+
+        with self.db.get_read_connection() as conn:
+            self.pending = {
+                row[0] for row in conn.execute('SELECT name FROM comfyui_bt_migration WHERE done = 0')
+            }
+        return current
+
+    def start(self) -> None:
+        """在后台线程中执行未完成的回填"""
+        if self._thread is not None or not self.pending:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_backfills, name="bt-artifact-migration", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """在当前批次结束后停止回填，剩余部分下次启动时继续"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def run_backfills(self) -> None:
+        """按版本顺序执行未完成的回填，某个版本失败时停止，后面的版本可能依赖它"""
+        for migration in self.migrations:
+            if self._stop.is_set():
+                return
+            if migration.name not in self.pending:
+                continue
+            try:
+                if not self._run_backfill(migration):
+                    return
+            except Exception as e:
+                logging.error(f"[Bt-ArtifactGround] 数据库升级失败（{migration.description}）: {str(e)}")
+                self._notify(f"{migration.description}失败: {str(e)}", "error", 5000)
+                return
+
+    def _run_backfill(self, migration: Migration) -> bool:
+        """执行一个版本的回填
+
+        Returns:
+            bool: 是否完成（被stop中断时返回False）
+        """
+        with self.db.get_read_connection() as conn:
+            last_id = conn.execute(
+                'SELECT last_id FROM comfyui_bt_migration WHERE version = ?', (migration.version,)
+            ).fetchone()[0] or 0
+            max_id = conn.execute(f'SELECT MAX(id) FROM {self.id_table}').fetchone()[0] or 0
+
+        # 只有耗时超过PROGRESS_INTERVAL的回填才推送进度，新库和小库静默完成
+        started = time.monotonic()
+        reported = started
+        notified = False
+        while migration.backfill is not None:
+            if self._stop.is_set():
+                return False
+            with self.db.get_connection() as conn:
+                next_id = migration.backfill(self.db, conn, last_id)
+                conn.execute('''
+                    UPDATE comfyui_bt_migration SET last_id = ?, updated_at = datetime('now', 'localtime')
+                    WHERE version = ?
+                ''', (last_id if next_id is None else next_id, migration.version))
+            if next_id is None:
+                break
+            last_id = next_id
+            now = time.monotonic()
+            if now - reported >= PROGRESS_INTERVAL and max_id:
+                reported = now
+                percent = min(100, last_id * 100 // max_id)
+                logging.info(f"[Bt-ArtifactGround] {migration.description}: {percent}%")
+                self._notify(f"正在后台{migration.description}（{percent}%），期间功能不受影响")
+                notified = True
+            self._stop.wait(BACKFILL_PAUSE)
+
+        with self.db.get_connection() as conn:
+            if migration.finish is not None:
+                migration.finish(conn)
+            conn.execute('''
+                UPDATE comfyui_bt_migration SET done = 1, updated_at = datetime('now', 'localtime')
+                WHERE version = ?
+            ''', (migration.version,))
+        self.pending.discard(migration.name)
+        logging.info(f"[Bt-ArtifactGround] {migration.description}完成，耗时{time.monotonic() - started:.1f}秒")
+        if notified:
+            self._notify(f"{migration.description}完成", "success")
+        return True
+
+    def _notify(self, message: str, type: str = "info", timeout_millis: int = 3000) -> None:
+        if self.notify is None:
+            return
+        try:
+            self.notify(message, "数据库升级", type, timeout_millis)
+        except Exception as e:
+            logging.debug(f"[Bt-ArtifactGround] 发送升级进度失败: {str(e)}")
@@ -1,28 +1,397 @@
+import base64
+import datetime
 import json
-from typing import Optional, List, Dict, Any
+import time
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
 from ..base import BaseDB
+from ..migration import MigrationRunner
+from ..blob import (
+    CODEC_ZLIB, canonical_json, compress, content_hash, decompress,
+    document_family, json_diff, json_patch,
+)
+from .artifact_migrations import MIGRATIONS, add_artifact_counts
+
+# 参与全文检索的节点文本输入（CLIPTextEncode的text、即梦节点的prompt等）
+SEARCH_TEXT_INPUTS = ('text', 'text_g', 'text_l', 'prompt', 'positive', 'negative', 'string')
+# trigram分词器按3个字符切分，更短的检索词改用子串匹配
+FTS_MIN_TERM_LENGTH = 3
+# 差量超过完整文档的这个比例时，不再保存差量而是写入新的blob
+MAX_DELTA_RATIO = 0.5
+# 写入时缓存的各族基准文档数量
+BASE_CACHE_SIZE = 32
+# 时间过滤支持的字符串格式（本地时间）
+TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M')
+
+# 读取完整记录时查询的列
+FULL_COLUMNS = '''id, prompt_id, meta, outputs, status, prompt, result_status, created_at,
+                prompt_blob, prompt_delta, meta_blob, meta_delta, created_ts'''
+# 列表摘要查询的列
+SUMMARY_COLUMNS = "id, prompt_id, result_status, created_at, created_ts"
+
+
+
+def outputs_digest(outputs: dict) -> List[Dict[str, Any]]:
+    """从outputs中提取图片摘要（节点ID、文件名、子目录、类型）"""
+    images = []
+    for node_id, output in (outputs or {}).items():
+        if not isinstance(output, dict):
+            continue
+        for image in output.get('images') or []:
+            if isinstance(image, dict) and image.get('filename'):
+                images.append({
+                    'node_id': node_id,
+                    'filename': image['filename'],
+                    'subfolder': image.get('subfolder', ''),
+                    'type': image.get('type', 'output'),
+                    'width': image.get('width'),
+                    'height': image.get('height'),
+                })
+    return images
+
+
+def parse_time(value, end: bool = False) -> Optional[int]:
+    """把时间过滤参数转换为epoch秒
+
+    支持epoch秒（数字）、本地时间字符串，以及只有日期的 YYYY-MM-DD；
+    只有日期且作为结束时间时取第二天零点，即包含当天。
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if text.lstrip('-').isdigit():
+        return int(text)
+    try:
+        day = datetime.datetime.strptime(text, '%Y-%m-%d')
+        if end:
+            day += datetime.timedelta(days=1)
+        return int(time.mktime(day.timetuple()))
+    except ValueError:
+        pass
+    for fmt in TIME_FORMATS:
+        try:
+            return int(time.mktime(datetime.datetime.strptime(text, fmt).timetuple()))
+        except ValueError:
+            continue
+    raise ValueError(f"无效的时间: {value}")
+
+
+def prompt_search_text(prompt) -> str:
+    """从prompt中提取用于全文检索的文本
+
+    prompt 为 ComfyUI 历史记录中的 [number, prompt_id, 节点图, extra_data, outputs] 列表，
+    也兼容直接传入节点图。
+    """
+    graph = prompt
+    if isinstance(prompt, (list, tuple)):
+        graph = prompt[2] if len(prompt) > 2 else {}
+    if not isinstance(graph, dict):
+        return ''
+    texts = []
+    for node in graph.values():
+        inputs = node.get('inputs') if isinstance(node, dict) else None
+        if not isinstance(inputs, dict):
+            continue
+        for key in SEARCH_TEXT_INPUTS:
+            value = inputs.get(key)
+            if isinstance(value, str) and value.strip() and value not in texts:
+                texts.append(value)
+    return '\n'.join(texts)
+
 
 class ArtifactDB(BaseDB):
-    def init_db(self) -> None:
-        """初始化数据库，创建必要的表"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            # 创建新表结构（如果不存在）
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS comfyui_bt_artifact (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    prompt_id TEXT UNIQUE NOT NULL,  -- 唯一的提示词ID
-                    meta TEXT,           -- 存储元数据，JSON格式
-                    outputs TEXT,        -- 存储输出数据，JSON格式
-                    status TEXT,         -- 存储状态信息，JSON格式
-                    prompt TEXT,         -- 存储提示词数据，JSON格式
-                    result_status TEXT DEFAULT '0',  -- 结果状态：0-处理中 1-已完成 2-错误
-                    created_at DATETIME
-                )
-            ''')
-            # 创建prompt_id索引
-            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_prompt_id ON comfyui_bt_artifact(prompt_id)')
-            conn.commit()
+    # 当前SQLite是否支持FTS5 trigram全文检索，不支持时退化为对检索文本表的LIKE查询
+    fts_enabled = False
+
+    @property
+    def search_table(self) -> str:
+        """保存检索文本的表，rowid即记录ID"""
+        return 'comfyui_bt_artifact_fts' if self.fts_enabled else 'comfyui_bt_artifact_text'
+
+    def __init__(self, db_path: str = None):
+        # 族 -> (blob哈希, 文档)，写入差量时避免反复解压基准文档
+        self._base_cache = OrderedDict()
+        # 数据库迁移，init_db时创建
+        self.migrations = None
+        super().__init__(db_path)
+
+    def init_db(self, notify=None) -> None:
+        """初始化数据库：同步执行结构迁移，回填由 start_migrations() 在后台执行
+
+        Args:
+            notify: 迁移进度回调 notify(message, title, type, timeout_millis)
+        """
+        self.migrations = MigrationRunner(self, MIGRATIONS, 'comfyui_bt_artifact', notify=notify)
+        self.migrations.upgrade()
+        with self.get_read_connection() as conn:
+            self.fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comfyui_bt_artifact_fts'"
+            ).fetchone() is not None
+
+    def start_migrations(self) -> None:
+        """在后台线程中执行未完成的回填"""
+        if self.migrations is not None:
+            self.migrations.start()
+
+    def close(self) -> None:
+        if self.migrations is not None:
+            self.migrations.stop()
+        super().close()
+
+    def _store_document(self, conn, doc) -> Tuple[str, Optional[str]]:
+        """把文档写入压缩存储
+
+        同族已有基准blob且差量足够小时只返回差量，否则写入新的blob。
+
+        Returns:
+            (blob哈希, 差量JSON或None)
+        """
+        raw = canonical_json(doc)
+        # ComfyUI历史中的prompt是元组，按JSON重新加载为列表，与从blob读出的基准文档类型一致才能计算差量
+        doc = json.loads(raw)
+        family = document_family(doc)
+        base = self._base_cache.get(family)
+        if base is None:
+            row = conn.execute('''
+                SELECT hash, codec, data FROM comfyui_bt_artifact_blob
+                WHERE family = ? ORDER BY rowid DESC LIMIT 1
+            ''', (family,)).fetchone()
+            if row:
+                base = (row[0], json.loads(decompress(row[2], row[1])))
+        if base is not None:
+            self._cache_base(family, base)
+            patch = json_diff(base[1], doc)
+            if patch is None:
+                return base[0], None
+            delta = canonical_json(patch)
+            if len(delta) <= len(raw) * MAX_DELTA_RATIO:
+                return base[0], delta
+
+        blob_hash = content_hash(raw)
+        conn.execute('''
+            INSERT OR IGNORE INTO comfyui_bt_artifact_blob (hash, family, codec, data, raw_size)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (blob_hash, family, CODEC_ZLIB, compress(raw), len(raw)))
+        self._cache_base(family, (blob_hash, doc))
+        return blob_hash, None
+
+    def _on_rollback(self) -> None:
+        # 缓存中可能有未提交的blob，回滚后不能再作为基准
+        self._base_cache.clear()
+
+    def _cache_base(self, family: str, base) -> None:
+        self._base_cache[family] = base
+        self._base_cache.move_to_end(family)
+        while len(self._base_cache) > BASE_CACHE_SIZE:
+            self._base_cache.popitem(last=False)
+
+    def _document_values(self, conn, doc) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """文档写入时三列的值：(原JSON列, blob哈希, 差量)，空文档直接保存在原列"""
+        if not doc:
+            return json.dumps(doc or {}), None, None
+        blob_hash, delta = self._store_document(conn, doc)
+        return None, blob_hash, delta
+
+    @staticmethod
+    def _load_document(conn, legacy: Optional[str], blob_hash: Optional[str], delta: Optional[str]):
+        """读取文档：有blob时解压并应用差量，否则读取原JSON列"""
+        if blob_hash:
+            row = conn.execute(
+                'SELECT codec, data FROM comfyui_bt_artifact_blob WHERE hash = ?', (blob_hash,)
+            ).fetchone()
+            if row:
+                doc = json.loads(decompress(row[1], row[0]))
+                return json_patch(doc, json.loads(delta)) if delta else doc
+        return json.loads(legacy) if legacy else {}
+
+    def _row_to_artifact(self, conn, row) -> Dict[str, Any]:
+        """FULL_COLUMNS 查询结果转换为完整记录"""
+        return {
+            'id': row[0],
+            'prompt_id': row[1],
+            'meta': self._load_document(conn, row[2], row[10], row[11]),
+            'outputs': json.loads(row[3]) if row[3] else {},
+            'status': json.loads(row[4]) if row[4] else {},
+            'prompt': self._load_document(conn, row[5], row[8], row[9]),
+            'result_status': row[6],
+            'created_at': row[7],
+            'created_ts': row[12]
+        }
+
+    def _prune_blobs(self, conn, blob_hashes) -> None:
+        """删除不再被任何记录引用的blob"""
+        for blob_hash in {h for h in blob_hashes if h}:
+            referenced = conn.execute('''
+                SELECT 1 FROM comfyui_bt_artifact WHERE prompt_blob = ?
+                UNION ALL
+                SELECT 1 FROM comfyui_bt_artifact WHERE meta_blob = ?
+                LIMIT 1
+            ''', (blob_hash, blob_hash)).fetchone()
+            if not referenced:
+                conn.execute('DELETE FROM comfyui_bt_artifact_blob WHERE hash = ?', (blob_hash,))
+        self._base_cache.clear()
+
+    def backfill_created_ts(self, conn, last_id: int, batch_size: int = 5000) -> Optional[int]:
+        """根据created_at（本地时间）计算一批记录的created_ts
+
+        Returns:
+            int: 处理到的记录ID，没有更多记录时返回None
+        """
+        row = conn.execute('''
+            SELECT MAX(id) FROM (
+                SELECT id FROM comfyui_bt_artifact WHERE id > ? ORDER BY id LIMIT ?
+            )
+        ''', (last_id, batch_size)).fetchone()
+        if row[0] is None:
+            return None
+        conn.execute('''
+            UPDATE comfyui_bt_artifact
+            SET created_ts = CAST(strftime('%s', created_at, 'utc') AS INTEGER)
+            WHERE id > ? AND id <= ? AND created_ts IS NULL
+        ''', (last_id, row[0]))
+        return row[0]
+
+    def compact_legacy_documents(self, conn, last_id: int, batch_size: int = 200) -> Optional[int]:
+        """把一批旧记录中未压缩的prompt/meta转存到压缩存储
+
+        Returns:
+            int: 处理到的记录ID，没有更多记录时返回None
+        """
+        rows = conn.execute('''
+            SELECT id, prompt, meta FROM comfyui_bt_artifact
+            WHERE id > ? AND prompt_blob IS NULL AND meta_blob IS NULL
+            ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return None
+        for artifact_id, prompt, meta in rows:
+            prompt_values = self._document_values(conn, json.loads(prompt) if prompt else {})
+            meta_values = self._document_values(conn, json.loads(meta) if meta else {})
+            conn.execute('''
+                UPDATE comfyui_bt_artifact
+                SET prompt = ?, prompt_blob = ?, prompt_delta = ?,
+                    meta = ?, meta_blob = ?, meta_delta = ?
+                WHERE id = ?
+            ''', (*prompt_values, *meta_values, artifact_id))
+        return rows[-1][0]
+
+    @staticmethod
+    def _write_images(conn, artifact_id: int, outputs: dict) -> None:
+        """用outputs重建某条记录的图片行"""
+        conn.execute('DELETE FROM comfyui_bt_artifact_image WHERE artifact_id = ?', (artifact_id,))
+        conn.executemany('''
+            INSERT INTO comfyui_bt_artifact_image (artifact_id, node_id, filename, subfolder, type, width, height)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (artifact_id, image['node_id'], image['filename'], image['subfolder'],
+             image['type'], image['width'], image['height'])
+            for image in outputs_digest(outputs)
+        ])
+
+    def _write_search_text(self, conn, artifact_id: int, prompt) -> None:
+        """用prompt重建某条记录的检索文本
+
+        prompt本身压缩存储，检索文本单独保存：支持FTS5时写入全文检索表，否则写入检索文本表供LIKE查询。
+        """
+        table = self.search_table
+        conn.execute(f'DELETE FROM {table} WHERE rowid = ?', (artifact_id,))
+        text = prompt_search_text(prompt)
+        if text:
+            conn.execute(f'INSERT INTO {table} (rowid, text) VALUES (?, ?)', (artifact_id, text))
+
+    def backfill_search_index(self, conn, last_id: int, batch_size: int = 500) -> Optional[int]:
+        """把一批已有记录prompt中的文本写入检索表
+
+        Returns:
+            int: 处理到的记录ID，没有更多记录时返回None
+        """
+        rows = conn.execute('''
+            SELECT id, prompt, prompt_blob, prompt_delta FROM comfyui_bt_artifact
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return None
+        for artifact_id, prompt, prompt_blob, prompt_delta in rows:
+            prompt = self._load_document(conn, prompt, prompt_blob, prompt_delta)
+            if prompt:
+                self._write_search_text(conn, artifact_id, prompt)
+        return rows[-1][0]
+
+    def _search_conditions(self, q: str) -> Tuple[List[str], List[Any], bool]:
+        """构建全文检索条件
+
+        Returns:
+            (条件列表, 参数列表, 是否可按相关度排序)
+        """
+        terms = [term for term in q.split() if term]
+        if not self.fts_enabled:
+            conditions = ["comfyui_bt_artifact_text.text LIKE ?" for _ in terms]
+            return conditions, [f"%{term}%" for term in terms], False
+        conditions = []
+        params = []
+        match_terms = [term for term in terms if len(term) >= FTS_MIN_TERM_LENGTH]
+        if match_terms:
+            # 每个检索词加引号按短语匹配，避免用户输入被当作FTS语法
+            conditions.append("comfyui_bt_artifact_fts MATCH ?")
+            params.append(" ".join('"' + term.replace('"', '""') + '"' for term in match_terms))
+        for term in terms:
+            if len(term) < FTS_MIN_TERM_LENGTH:
+                # 部分SQLite版本的trigram表对过短的LIKE模式返回空结果，这里用instr匹配
+                conditions.append("instr(lower(comfyui_bt_artifact_fts.text), lower(?)) > 0")
+                params.append(term)
+        return conditions, params, bool(match_terms)
+
+    def backfill_artifact_images(self, conn, last_id: int, batch_size: int = 500) -> Optional[int]:
+        """把一批已有记录outputs中的图片写入图片表
+
+        Returns:
+            int: 处理到的记录ID，没有更多记录时返回None
+        """
+        rows = conn.execute('''
+            SELECT id, outputs FROM comfyui_bt_artifact
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return None
+        for artifact_id, outputs in rows:
+            if outputs:
+                self._write_images(conn, artifact_id, json.loads(outputs))
+        return rows[-1][0]
+
+    @staticmethod
+    def rebuild_artifact_counts(conn, last_id: int, batch_size: int = 5000) -> Optional[int]:
+        """把一批记录按(created_ts所在日期, result_status)累加到汇总表，之后由触发器维护
+
+        Returns:
+            int: 处理到的记录ID，没有更多记录时返回None
+        """
+        row = conn.execute('''
+            SELECT MAX(id) FROM (
+                SELECT id FROM comfyui_bt_artifact WHERE id > ? ORDER BY id LIMIT ?
+            )
+        ''', (last_id, batch_size)).fetchone()
+        if row[0] is None:
+            return None
+        add_artifact_counts(conn, last_id, row[0])
+        return row[0]
+
+    @staticmethod
+    def encode_cursor(artifact: Dict[str, Any]) -> str:
+        """根据记录生成翻页游标（created_ts + id）"""
+        raw = json.dumps([artifact['created_ts'], artifact['id']])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """解析翻页游标，返回(created_ts, id)"""
+        try:
+            created_ts, artifact_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            # 旧记录回填created_ts之前游标中的时间为空
+            return (None if created_ts is None else int(created_ts)), int(artifact_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"无效的游标: {cursor}") from e
 
     def save_artifact(self, prompt_id: str, meta: dict = None, outputs: dict = None, 
                      status: dict = None, prompt: dict = None, result_status: str = '0') -> int:
@@ -40,20 +409,55 @@ class ArtifactDB(BaseDB):
             int: 插入记录的ID
         """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO comfyui_bt_artifact (prompt_id, meta, outputs, status, prompt, result_status, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))
-            ''', (
-                prompt_id,
-                json.dumps(meta or {}),
-                json.dumps(outputs or {}),
-                json.dumps(status or {}),
-                json.dumps(prompt or {}),
-                result_status
-            ))
-            conn.commit()
-            return cursor.lastrowid
+            return self._insert_artifact(conn, prompt_id, meta=meta, outputs=outputs, status=status,
+                                         prompt=prompt, result_status=result_status)
+
+    def _insert_artifact(self, conn, prompt_id: str, meta: dict = None, outputs: dict = None,
+                         status: dict = None, prompt: dict = None, result_status: str = '0',
+                         ignore_existing: bool = False) -> Optional[int]:
+        """在给定连接上插入记录，ignore_existing为True时prompt_id已存在则跳过并返回None"""
+        cursor = conn.cursor()
+        meta_json, meta_blob, meta_delta = self._document_values(conn, meta)
+        prompt_json, prompt_blob, prompt_delta = self._document_values(conn, prompt)
+        conflict = 'OR IGNORE ' if ignore_existing else ''
+        cursor.execute(f'''
+            INSERT {conflict}INTO comfyui_bt_artifact (prompt_id, meta, outputs, status, prompt, result_status,
+                                                       created_at, created_ts,
+                                                       prompt_blob, prompt_delta, meta_blob, meta_delta)
+            VALUES (?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), CAST(strftime('%s', 'now') AS INTEGER),
+                    ?, ?, ?, ?)
+        ''', (
+            prompt_id,
+            meta_json,
+            json.dumps(outputs or {}),
+            json.dumps(status or {}),
+            prompt_json,
+            result_status,
+            prompt_blob,
+            prompt_delta,
+            meta_blob,
+            meta_delta
+        ))
+        if cursor.rowcount == 0:
+            return None
+        if outputs:
+            self._write_images(conn, cursor.lastrowid, outputs)
+        if prompt:
+            self._write_search_text(conn, cursor.lastrowid, prompt)
+        return cursor.lastrowid
+
+    def list_processing_prompts(self, after_id: int = 0, limit: int = 500) -> List[Tuple[int, str, Optional[int]]]:
+        """按id顺序分批列出处理中（result_status为0）的记录
+
+        Returns:
+            list: [(id, prompt_id, created_ts), ...]
+        """
+        with self.get_read_connection() as conn:
+            return conn.execute('''
+                SELECT id, prompt_id, created_ts FROM comfyui_bt_artifact
+                WHERE result_status = '0' AND id > ?
+                ORDER BY id LIMIT ?
+            ''', (after_id, limit)).fetchall()
 
     def update_result_status(self, prompt_id: str, result_status: str) -> bool:
         """更新结果状态
@@ -72,7 +476,6 @@ class ArtifactDB(BaseDB):
                 SET result_status = ? 
                 WHERE prompt_id = ?
             ''', (result_status, prompt_id))
-            conn.commit()
             return cursor.rowcount > 0
 
     def update_artifact(self, prompt_id: str, meta: dict = None, outputs: dict = None,
@@ -91,183 +494,366 @@ class ArtifactDB(BaseDB):
             bool: 是否更新成功
         """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 构建更新字段
-            update_fields = []
-            params = []
-            
-            if meta is not None:
-                update_fields.append("meta = ?")
-                params.append(json.dumps(meta))
+            return self._update_artifact(conn, prompt_id, meta=meta, outputs=outputs, status=status,
+                                         prompt=prompt, result_status=result_status)
+
+    def _update_artifact(self, conn, prompt_id: str, meta: dict = None, outputs: dict = None,
+                         status: dict = None, prompt: dict = None, result_status: str = None) -> bool:
+        """在给定连接上更新记录"""
+        cursor = conn.cursor()
+
+        # 记录原来引用的blob，更新后清理不再使用的
+        old_blobs = None
+        if meta is not None or prompt is not None:
+            old_blobs = cursor.execute(
+                'SELECT prompt_blob, meta_blob FROM comfyui_bt_artifact WHERE prompt_id = ?', (prompt_id,)
+            ).fetchone()
+
+        # 构建更新字段
+        update_fields = []
+        params = []
+
+        if meta is not None:
+            update_fields.append("meta = ?, meta_blob = ?, meta_delta = ?")
+            params.extend(self._document_values(conn, meta))
+        if outputs is not None:
+            update_fields.append("outputs = ?")
+            params.append(json.dumps(outputs))
+        if status is not None:
+            update_fields.append("status = ?")
+            params.append(json.dumps(status))
+        if prompt is not None:
+            update_fields.append("prompt = ?, prompt_blob = ?, prompt_delta = ?")
+            params.extend(self._document_values(conn, prompt))
+        if result_status is not None:
+            update_fields.append("result_status = ?")
+            params.append(result_status)
+
+        if not update_fields:
+            return False
+
+        # 添加WHERE条件参数
+        params.append(prompt_id)
+
+        # 构建并执行更新语句
+        sql = f'''
+            UPDATE comfyui_bt_artifact 
+            SET {", ".join(update_fields)}
+            WHERE prompt_id = ?
+        '''
+        cursor.execute(sql, params)
+        updated = cursor.rowcount > 0
+        if updated and old_blobs and any(old_blobs):
+            self._prune_blobs(conn, old_blobs)
+
+        # 同步输出图片表和全文检索表
+        if updated and (outputs is not None or prompt is not None):
+            artifact_id = conn.execute(
+                'SELECT id FROM comfyui_bt_artifact WHERE prompt_id = ?', (prompt_id,)
+            ).fetchone()[0]
             if outputs is not None:
-                update_fields.append("outputs = ?")
-                params.append(json.dumps(outputs))
-            if status is not None:
-                update_fields.append("status = ?")
-                params.append(json.dumps(status))
+                self._write_images(conn, artifact_id, outputs)
             if prompt is not None:
-                update_fields.append("prompt = ?")
-                params.append(json.dumps(prompt))
-            if result_status is not None:
-                update_fields.append("result_status = ?")
-                params.append(result_status)
-                
-            if not update_fields:
-                return False
-                
-            # 添加WHERE条件参数
-            params.append(prompt_id)
-            
-            # 构建并执行更新语句
-            sql = f'''
-                UPDATE comfyui_bt_artifact 
-                SET {", ".join(update_fields)}
-                WHERE prompt_id = ?
-            '''
-            cursor.execute(sql, params)
-            conn.commit()
-            
-            return cursor.rowcount > 0
+                self._write_search_text(conn, artifact_id, prompt)
+
+        return updated
+
+    def apply_writes(self, writes) -> None:
+        """在一个事务中批量执行写入
+
+        Args:
+            writes: [(prompt_id, insert_fields, update_fields)]。insert_fields不为None时，记录不存在则用
+                    insert_fields和update_fields合并后插入；记录已存在（或insert_fields为None）时只按update_fields更新。
+                    字段为save_artifact/update_artifact的关键字参数
+        """
+        with self.get_connection() as conn:
+            for prompt_id, insert_fields, update_fields in writes:
+                if insert_fields is not None:
+                    fields = {**insert_fields, **update_fields}
+                    if self._insert_artifact(conn, prompt_id, ignore_existing=True, **fields) is not None:
+                        continue
+                if update_fields:
+                    self._update_artifact(conn, prompt_id, **update_fields)
 
     def get_artifact(self, artifact_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取记录"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, prompt_id, meta, outputs, status, prompt, result_status, created_at
+        with self.get_read_connection() as conn:
+            row = conn.execute(f'''
+                SELECT {FULL_COLUMNS}
                 FROM comfyui_bt_artifact WHERE id = ?
-            ''', (artifact_id,))
+            ''', (artifact_id,)).fetchone()
             
-            row = cursor.fetchone()
             if row:
-                return {
-                    'id': row[0],
-                    'prompt_id': row[1],
-                    'meta': json.loads(row[2]) if row[2] else {},
-                    'outputs': json.loads(row[3]) if row[3] else {},
-                    'status': json.loads(row[4]) if row[4] else {},
-                    'prompt': json.loads(row[5]) if row[5] else {},
-                    'result_status': row[6],
-                    'created_at': row[7]
-                }
+                return self._row_to_artifact(conn, row)
             return None
 
     def get_artifact_by_prompt_id(self, prompt_id: str) -> Optional[Dict[str, Any]]:
         """根据prompt_id获取记录"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, prompt_id, meta, outputs, status, prompt, result_status, created_at
+        with self.get_read_connection() as conn:
+            row = conn.execute(f'''
+                SELECT {FULL_COLUMNS}
                 FROM comfyui_bt_artifact WHERE prompt_id = ?
-            ''', (prompt_id,))
+            ''', (prompt_id,)).fetchone()
             
-            row = cursor.fetchone()
             if row:
-                return {
-                    'id': row[0],
-                    'prompt_id': row[1],
-                    'meta': json.loads(row[2]) if row[2] else {},
-                    'outputs': json.loads(row[3]) if row[3] else {},
-                    'status': json.loads(row[4]) if row[4] else {},
-                    'prompt': json.loads(row[5]) if row[5] else {},
-                    'result_status': row[6],
-                    'created_at': row[7]
-                }
+                return self._row_to_artifact(conn, row)
             return None
 
-    def list_artifacts(self, limit: int = 100, offset: int = 0, date: str = '', status: str = '') -> List[Dict[str, Any]]:
+    def list_artifacts(self, limit: int = 100, offset: int = 0, date: str = '', status: str = '',
+                       cursor: str = None, summary: bool = False, q: str = '',
+                       start=None, end=None) -> List[Dict[str, Any]]:
         """获取记录列表
         
         Args:
             limit: 限制返回记录数
-            offset: 起始偏移量
+            offset: 起始偏移量（传入cursor时忽略）
             date: 日期过滤（YYYY-MM-DD）
             status: 状态过滤（0,1,2）
+            cursor: 翻页游标，返回该游标之后（更早）的记录
+            summary: 只返回摘要字段（不含prompt/meta/status），完整数据通过get_artifact获取
+            q: 全文检索关键词（空格分隔），有关键词时按相关度排序并忽略cursor
+            start: 起始时间（包含），格式见parse_time
+            end: 结束时间（不包含；只有日期时包含当天），格式见parse_time
             
         Returns:
             list: 记录列表
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
+        with self.get_read_connection() as conn:
             # 构建查询条件
-            conditions = []
-            params = []
+            conditions, params = self._time_conditions(date, start, end)
             
-            if date:
-                conditions.append("DATE(created_at) = DATE(?)")
-                params.append(date)
             if status:
                 conditions.append("result_status = ?")
                 params.append(status)
+            join = ''
+            order_by = "created_ts DESC, id DESC"
+            if q and q.strip():
+                search_conditions, search_params, ranked = self._search_conditions(q)
+                conditions.extend(search_conditions)
+                params.extend(search_params)
+                join = f" JOIN {self.search_table} ON {self.search_table}.rowid = comfyui_bt_artifact.id"
+                if ranked:
+                    order_by = "comfyui_bt_artifact_fts.rank, id DESC"
+            elif cursor:
+                created_ts, artifact_id = self.decode_cursor(cursor)
+                if created_ts is None:
+                    # created_ts为空的旧记录倒序排在最后，只按id翻页
+                    conditions.append("created_ts IS NULL AND id < ?")
+                    params.append(artifact_id)
+                elif self.migrations is not None and self.migrations.is_pending('created_ts'):
+                    conditions.append("((created_ts, id) < (?, ?) OR created_ts IS NULL)")
+                    params.extend([created_ts, artifact_id])
+                else:
+                    conditions.append("(created_ts, id) < (?, ?)")
+                    params.extend([created_ts, artifact_id])
+                offset = 0
                 
             # 构建SQL语句
-            sql = '''
-                SELECT id, prompt_id, meta, outputs, status, prompt, result_status, created_at
-                FROM comfyui_bt_artifact
+            if summary:
+                columns = SUMMARY_COLUMNS
+            else:
+                columns = FULL_COLUMNS
+            sql = f'''
+                SELECT {columns}
+                FROM comfyui_bt_artifact{join}
             '''
             
             if conditions:
                 sql += f" WHERE {' AND '.join(conditions)}"
             
-            sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+            sql += f" ORDER BY {order_by} LIMIT ? OFFSET ?"
             params.extend([limit, offset])
             
-            cursor.execute(sql, params)
+            rows = conn.execute(sql, params).fetchall()
             
-            return [{
-                'id': row[0],
-                'prompt_id': row[1],
-                'meta': json.loads(row[2]) if row[2] else {},
-                'outputs': json.loads(row[3]) if row[3] else {},
-                'status': json.loads(row[4]) if row[4] else {},
-                'prompt': json.loads(row[5]) if row[5] else {},
-                'result_status': row[6],
-                'created_at': row[7]
-            } for row in cursor.fetchall()]
+            if summary:
+                return self._summaries_from_rows(conn, rows)
+            return [self._row_to_artifact(conn, row) for row in rows]
+
+    @staticmethod
+    def _summaries_from_rows(conn, rows) -> List[Dict[str, Any]]:
+        """SUMMARY_COLUMNS 查询结果转换为摘要，图片从图片表批量读取"""
+        summaries = [{
+            'id': row[0],
+            'prompt_id': row[1],
+            'result_status': row[2],
+            'created_at': row[3],
+            'created_ts': row[4],
+            'images': [],
+            'image_count': 0,
+        } for row in rows]
+        if not summaries:
+            return summaries
+        by_id = {item['id']: item for item in summaries}
+        placeholders = ", ".join("?" * len(by_id))
+        images = conn.execute(f'''
+            SELECT artifact_id, node_id, filename, subfolder, type
+            FROM comfyui_bt_artifact_image
+            WHERE artifact_id IN ({placeholders})
+            ORDER BY id
+        ''', list(by_id)).fetchall()
+        for artifact_id, node_id, filename, subfolder, image_type in images:
+            item = by_id[artifact_id]
+            item['images'].append({
+                'node_id': node_id,
+                'filename': filename,
+                'subfolder': subfolder,
+                'type': image_type,
+            })
+            item['image_count'] += 1
+        return summaries
+
+    def _time_conditions(self, date: str = '', start=None, end=None) -> Tuple[List[str], List[Any]]:
+        """构建created_ts上的范围条件，单日过滤也转换为范围，均可命中索引
+
+        created_ts回填完成前改为比较created_at，结果正确但不走索引。
+        """
+        conditions = []
+        params = []
+        if date:
+            start = max(parse_time(date), parse_time(start) or 0) if start not in (None, '') else date
+            end = min(parse_time(date, end=True), parse_time(end, end=True)) if end not in (None, '') else date
+        start_ts = parse_time(start)
+        end_ts = parse_time(end, end=True)
+        column, placeholder = 'created_ts', '?'
+        if self.migrations is not None and self.migrations.is_pending('created_ts'):
+            column, placeholder = 'created_at', "datetime(?, 'unixepoch', 'localtime')"
+        if start_ts is not None:
+            conditions.append(f"{column} >= {placeholder}")
+            params.append(start_ts)
+        if end_ts is not None:
+            conditions.append(f"{column} < {placeholder}")
+            params.append(end_ts)
+        return conditions, params
+
+    def list_artifact_images(self, artifact_id: int) -> List[Dict[str, Any]]:
+        """获取某条记录的所有输出图片"""
+        with self.get_read_connection() as conn:
+            rows = conn.execute('''
+                SELECT node_id, filename, subfolder, type, width, height
+                FROM comfyui_bt_artifact_image WHERE artifact_id = ? ORDER BY id
+            ''', (artifact_id,)).fetchall()
+        return [{
+            'node_id': row[0],
+            'filename': row[1],
+            'subfolder': row[2],
+            'type': row[3],
+            'width': row[4],
+            'height': row[5],
+        } for row in rows]
+
+    def find_artifact_by_image(self, filename: str, subfolder: str = None,
+                               image_type: str = None) -> Optional[Dict[str, Any]]:
+        """根据输出文件反查生成它的记录（只返回摘要）
+
+        Args:
+            filename: 文件名
+            subfolder: 子目录，None表示不限
+            image_type: 类型（output/temp），None表示不限
+        """
+        conditions = ["i.filename = ?"]
+        params = [filename]
+        if subfolder is not None:
+            conditions.append("i.subfolder = ?")
+            params.append(subfolder)
+        if image_type:
+            conditions.append("i.type = ?")
+            params.append(image_type)
+        with self.get_read_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT a.id, a.prompt_id, a.result_status, a.created_at, a.created_ts
+                FROM comfyui_bt_artifact_image i
+                JOIN comfyui_bt_artifact a ON a.id = i.artifact_id
+                WHERE {" AND ".join(conditions)}
+                ORDER BY a.id DESC LIMIT 1
+            ''', params).fetchall()
+            summaries = self._summaries_from_rows(conn, rows)
+        return summaries[0] if summaries else None
+
+    def get_summaries_by_prompt_ids(self, prompt_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """按prompt_id批量读取记录摘要
+
+        Returns:
+            dict: {prompt_id: 摘要}，不存在的prompt_id不在结果中
+        """
+        result = {}
+        prompt_ids = list(dict.fromkeys(prompt_ids))
+        with self.get_read_connection() as conn:
+            # 分批查询，避免超过SQLite的参数个数限制
+            for start in range(0, len(prompt_ids), 500):
+                chunk = prompt_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(f'''
+                    SELECT {SUMMARY_COLUMNS} FROM comfyui_bt_artifact
+                    WHERE prompt_id IN ({placeholders})
+                ''', chunk).fetchall()
+                for summary in self._summaries_from_rows(conn, rows):
+                    result[summary['prompt_id']] = summary
+        return result
 
     def delete_artifact(self, id: int) -> bool:
         """删除指定的生成记录"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            blobs = cursor.execute(
+                "SELECT prompt_blob, meta_blob FROM comfyui_bt_artifact WHERE id = ?", (id,)
+            ).fetchone()
             cursor.execute("DELETE FROM comfyui_bt_artifact WHERE id = ?", (id,))
-            conn.commit()
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+            if blobs:
+                self._prune_blobs(conn, blobs)
+            cursor.execute("DELETE FROM comfyui_bt_artifact_image WHERE artifact_id = ?", (id,))
+            cursor.execute(f"DELETE FROM {self.search_table} WHERE rowid = ?", (id,))
+            return deleted
 
-    def count_artifacts(self, date: str = '', status: str = '') -> int:
+    def count_artifacts(self, date: str = '', status: str = '', q: str = '', start=None, end=None) -> int:
         """统计记录总数
         
         Args:
             date: 日期过滤，格式为YYYY-MM-DD
             status: 状态过滤
+            q: 全文检索关键词
+            start: 起始时间（包含），格式见parse_time
+            end: 结束时间（不包含；只有日期时包含当天），格式见parse_time
             
         Returns:
             记录总数
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # 构建查询条件
-        conditions = []
-        params = []
-        
-        if date:
-            conditions.append("date(created_at) = ?")
-            params.append(date)
+        with self.get_read_connection() as conn:
+            # 没有关键词和时间范围时直接从汇总表读取，不扫描记录表（汇总表重建完成前按索引统计）
+            rollup_ready = self.migrations is not None and not self.migrations.is_pending('counts')
+            if rollup_ready and not (q and q.strip()) and start in (None, '') and end in (None, ''):
+                conditions = []
+                params = []
+                if date:
+                    conditions.append("day = DATE(?)")
+                    params.append(date)
+                if status:
+                    conditions.append("result_status = ?")
+                    params.append(status)
+                sql = "SELECT COALESCE(SUM(count), 0) FROM comfyui_bt_artifact_count"
+                if conditions:
+                    sql += " WHERE " + " AND ".join(conditions)
+                return conn.execute(sql, params).fetchone()[0]
             
-        if status:
-            conditions.append("status = ?") 
-            params.append(status)
+            # 构建查询条件
+            conditions, params = self._time_conditions(date, start, end)
             
-        # 拼接SQL
-        sql = "SELECT COUNT(*) FROM comfyui_bt_artifact"
-        if conditions:
-            sql += " WHERE " + " AND ".join(conditions)
+            if status:
+                conditions.append("result_status = ?") 
+                params.append(status)
             
-        # 执行查询    
-        cursor.execute(sql, params)
-        count = cursor.fetchone()[0]
-        
-        conn.close()
-        return count 
\ No newline at end of file
+            join = ''
+            if q and q.strip():
+                search_conditions, search_params, _ = self._search_conditions(q)
+                conditions.extend(search_conditions)
+                params.extend(search_params)
+                join = f" JOIN {self.search_table} ON {self.search_table}.rowid = comfyui_bt_artifact.id"
+            
+            # 拼接SQL
+            sql = f"SELECT COUNT(*) FROM comfyui_bt_artifact{join}"
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            
+            # 执行查询    
+            return conn.execute(sql, params).fetchone()[0]
@@ -0,0 +1,228 @@
+import logging
+import sqlite3
+from ..migration import Migration
+
+# 内容寻址存储的列（旧版本数据库需要补充）
+DOCUMENT_COLUMNS = (
+    ('prompt_blob', 'TEXT'),   # prompt基准blob的哈希
+    ('prompt_delta', 'TEXT'),  # 相对基准blob的差量，JSON格式
+    ('meta_blob', 'TEXT'),
+    ('meta_delta', 'TEXT'),
+)
+
+# 维护汇总计数的触发器，按created_ts所在的本地日期汇总
+_COUNT_DAY_NEW = "COALESCE(DATE(NEW.created_ts, 'unixepoch', 'localtime'), '')"
+_COUNT_DAY_OLD = "COALESCE(DATE(OLD.created_ts, 'unixepoch', 'localtime'), '')"
+_COUNT_INCREMENT = f'''
+    INSERT OR IGNORE INTO comfyui_bt_artifact_count (day, result_status, count)
+    VALUES ({_COUNT_DAY_NEW}, COALESCE(NEW.result_status, ''), 0);
+    UPDATE comfyui_bt_artifact_count SET count = count + 1
+    WHERE day = {_COUNT_DAY_NEW} AND result_status = COALESCE(NEW.result_status, '');
+'''
+_COUNT_DECREMENT = f'''
+    UPDATE comfyui_bt_artifact_count SET count = count - 1
+    WHERE day = {_COUNT_DAY_OLD} AND result_status = COALESCE(OLD.result_status, '');
+'''
+# 汇总表重建（版本6）期间触发器只维护已统计到的记录，其余记录由分批回填统计
+COUNT_VERSION = 6
+_COUNT_REBUILT = (
+    "COALESCE((SELECT done OR {row}.id <= last_id FROM comfyui_bt_migration WHERE version = %d), 1)" % COUNT_VERSION
+)
+
+
+def _count_triggers(rebuilding: bool = False) -> tuple:
+    new_ready = _COUNT_REBUILT.format(row='NEW') if rebuilding else None
+    old_ready = _COUNT_REBUILT.format(row='OLD') if rebuilding else None
+    return (
+        f'''
+        CREATE TRIGGER trg_artifact_count_insert AFTER INSERT ON comfyui_bt_artifact
+        {f"WHEN {new_ready}" if new_ready else ""}
+        BEGIN {_COUNT_INCREMENT} END
+        ''',
+        f'''
+        CREATE TRIGGER trg_artifact_count_update AFTER UPDATE OF result_status, created_ts ON comfyui_bt_artifact
+        WHEN (OLD.result_status IS NOT NEW.result_status OR OLD.created_ts IS NOT NEW.created_ts)
+            {f"AND {new_ready}" if new_ready else ""}
+        BEGIN {_COUNT_DECREMENT} {_COUNT_INCREMENT} END
+        ''',
+        f'''
+        CREATE TRIGGER trg_artifact_count_delete AFTER DELETE ON comfyui_bt_artifact
+        {f"WHEN {old_ready}" if old_ready else ""}
+        BEGIN {_COUNT_DECREMENT} END
+        ''',
+    )
+
+
+def _create_count_triggers(conn, rebuilding: bool = False) -> None:
+    for name in ('trg_artifact_count_insert', 'trg_artifact_count_update', 'trg_artifact_count_delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    for trigger_sql in _count_triggers(rebuilding):
+        conn.execute(trigger_sql)
+
+
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _create_artifact_table(conn) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comfyui_bt_artifact (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_id TEXT UNIQUE NOT NULL,  -- 唯一的提示词ID
+            meta TEXT,           -- 存储元数据，JSON格式
+            outputs TEXT,        -- 存储输出数据，JSON格式
+            status TEXT,         -- 存储状态信息，JSON格式
+            prompt TEXT,         -- 存储提示词数据，JSON格式
+            result_status TEXT DEFAULT '0',  -- 结果状态：0-处理中 1-已完成 2-错误
+            created_at DATETIME
+        )
+    ''')
+    # 创建prompt_id索引
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_prompt_id ON comfyui_bt_artifact(prompt_id)')
+
+
+def _create_blob_store(conn) -> None:
+    existing_columns = _columns(conn, 'comfyui_bt_artifact')
+    for column, column_type in DOCUMENT_COLUMNS:
+        if column not in existing_columns:
+            conn.execute(f'ALTER TABLE comfyui_bt_artifact ADD COLUMN {column} {column_type}')
+    # 压缩存储的文档，按内容哈希去重
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comfyui_bt_artifact_blob (
+            hash TEXT PRIMARY KEY,  -- 规范化JSON的sha256
+            family TEXT NOT NULL,   -- 文档族，同族文档以最新blob为基准保存差量
+            codec TEXT NOT NULL,    -- 压缩方式
+            data BLOB NOT NULL,     -- 压缩后的规范化JSON
+            raw_size INTEGER        -- 压缩前大小
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_blob_family ON comfyui_bt_artifact_blob(family)')
+
+
+def _create_blob_indexes(conn) -> None:
+    # 删除记录时判断blob是否仍被引用
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_prompt_blob ON comfyui_bt_artifact(prompt_blob)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_meta_blob ON comfyui_bt_artifact(meta_blob)')
+
+
+def _create_image_table(conn) -> None:
+    # 输出图片表：从outputs中拆出来，每个输出文件一行
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comfyui_bt_artifact_image (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            artifact_id INTEGER NOT NULL,  -- 所属记录ID
+            node_id TEXT,                  -- 输出节点ID
+            filename TEXT NOT NULL,        -- 文件名
+            subfolder TEXT DEFAULT '',     -- 子目录
+            type TEXT,                     -- 类型：output/temp/input
+            width INTEGER,                 -- 宽度（已知时）
+            height INTEGER                 -- 高度（已知时）
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_image_artifact_id ON comfyui_bt_artifact_image(artifact_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_image_filename ON comfyui_bt_artifact_image(filename)')
+
+
+def _create_search_index(conn) -> None:
+    # 全文检索表：rowid即记录ID
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS comfyui_bt_artifact_fts
+            USING fts5(text, tokenize = 'trigram')
+        ''')
+    except sqlite3.OperationalError as e:
+        logging.warning(f"当前SQLite不支持FTS5 trigram，全文检索退化为LIKE查询: {str(e)}")
+
+
+def _create_search_text_table(conn) -> None:
+    # 不支持FTS5时prompt的检索文本保存在普通表中，供LIKE查询（prompt列已转存到压缩存储）
+    fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comfyui_bt_artifact_fts'"
+    ).fetchone()
+    if fts is None:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS comfyui_bt_artifact_text (
+                artifact_id INTEGER PRIMARY KEY,  -- 记录ID
+                text TEXT NOT NULL                -- 检索文本
+            )
+        ''')
+
+
+def _add_created_ts(conn) -> None:
+    if 'created_ts' not in _columns(conn, 'comfyui_bt_artifact'):
+        conn.execute('ALTER TABLE comfyui_bt_artifact ADD COLUMN created_ts INTEGER')
+    # created_at上的分页索引由created_ts索引取代
+    conn.execute('DROP INDEX IF EXISTS idx_created_at_id')
+    conn.execute('DROP INDEX IF EXISTS idx_status_created_at_id')
+
+
+def _create_created_ts_indexes(conn) -> None:
+    # 列表分页和时间范围过滤索引：按(created_ts, id)倒序翻页，带状态过滤时走复合索引
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_created_ts_id ON comfyui_bt_artifact(created_ts, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_status_created_ts_id ON comfyui_bt_artifact(result_status, created_ts, id)')
+
+
+def _create_count_table(conn) -> None:
+    # 按天和结果状态汇总的记录数，由触发器在同一事务中维护
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comfyui_bt_artifact_count (
+            day TEXT NOT NULL,            -- 日期 YYYY-MM-DD
+            result_status TEXT NOT NULL,  -- 结果状态
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, result_status)
+        )
+    ''')
+    # 旧版本的触发器按created_at汇总，重建为按created_ts汇总；汇总表由回填从头分批重建
+    conn.execute('DELETE FROM comfyui_bt_artifact_count')
+    _create_count_triggers(conn, rebuilding=True)
+
+
+def _backfill_counts(db, conn, last_id: int):
+    if not last_id:
+        # 从头开始时清空汇总表（兼容升级时建了全量触发器、尚未开始重建的数据库）
+        conn.execute('DELETE FROM comfyui_bt_artifact_count')
+        _create_count_triggers(conn, rebuilding=True)
+    return db.rebuild_artifact_counts(conn, last_id)
+
+
+def _finish_count_table(conn) -> None:
+    # 最后一批回填之后新增的记录还未统计，补上后触发器改为维护全部记录
+    last_id = conn.execute(
+        'SELECT last_id FROM comfyui_bt_migration WHERE version = ?', (COUNT_VERSION,)
+    ).fetchone()[0] or 0
+    add_artifact_counts(conn, last_id)
+    _create_count_triggers(conn)
+
+
+def add_artifact_counts(conn, after_id: int, to_id: int = None) -> None:
+    """把id在(after_id, to_id]范围内的记录累加到汇总表，to_id为None时不限上界"""
+    upper = '' if to_id is None else ' AND id <= ?'
+    params = (after_id,) if to_id is None else (after_id, to_id)
+    conn.execute(f'''
+        INSERT INTO comfyui_bt_artifact_count (day, result_status, count)
+        SELECT COALESCE(DATE(created_ts, 'unixepoch', 'localtime'), ''), COALESCE(result_status, ''), COUNT(*)
+        FROM comfyui_bt_artifact
+        WHERE id > ?{upper}
+        GROUP BY 1, 2
+        ON CONFLICT (day, result_status) DO UPDATE SET count = count + excluded.count
+    ''', params)
+
+
+# 按版本顺序排列，已发布的版本不能修改，新的结构变更追加新版本
+MIGRATIONS = (
+    Migration(1, 'base', '创建记录表', _create_artifact_table),
+    Migration(2, 'documents', '转存提示词到压缩存储', _create_blob_store,
+              backfill=lambda db, conn, last_id: db.compact_legacy_documents(conn, last_id),
+              finish=_create_blob_indexes),
+    Migration(3, 'images', '建立图片索引', _create_image_table,
+              backfill=lambda db, conn, last_id: db.backfill_artifact_images(conn, last_id)),
+    Migration(4, 'search', '建立全文检索', _create_search_index,
+              backfill=lambda db, conn, last_id: db.backfill_search_index(conn, last_id) if db.fts_enabled else None),
+    Migration(5, 'created_ts', '建立时间索引', _add_created_ts,
+              backfill=lambda db, conn, last_id: db.backfill_created_ts(conn, last_id),
+              finish=_create_created_ts_indexes),
+    Migration(COUNT_VERSION, 'counts', '重建记录数汇总', _create_count_table,
+              backfill=_backfill_counts, finish=_finish_count_table),
+    Migration(7, 'search_text', '建立检索文本', _create_search_text_table,
+              backfill=lambda db, conn, last_id: None if db.fts_enabled else db.backfill_search_index(conn, last_id)),
+)
@@ -0,0 +1,179 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 单个事务最多合并的写入数
+WRITE_BATCH_SIZE = 200
+# 收到第一条写入后，继续等待合并的时间（秒）
+WRITE_BATCH_WINDOW = 0.05
+# 数据库忙时的重试次数和初始退避（秒）
+WRITE_MAX_RETRIES = 5
+WRITE_RETRY_DELAY = 0.1
+
+
+class ArtifactWriter:
+    """生成记录的异步写入队列
+
+    调用方只把写入放进队列立即返回，由后台线程合并同一prompt_id的写入，
+    按批次在一个事务中提交，数据库忙时退避重试，退出时把剩余写入全部落盘。
+    """
+
+    def __init__(self, artifact_db):
+        self.artifact_db = artifact_db
+        self._queue = queue.Queue()
+        self._thread = None
+        # 提交成功后的回调 callback(prompt_ids)，在写入线程中调用
+        self._listeners = []
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="bt-artifact-writer", daemon=True)
+        self._thread.start()
+
+    def add_listener(self, callback) -> None:
+        """订阅写入提交，callback(prompt_ids)在每批提交成功后调用"""
+        self._listeners.append(callback)
+
+    def save(self, prompt_id: str, **fields) -> None:
+        """新增记录（记录已存在时按fields更新），参数同ArtifactDB.save_artifact"""
+        self._put(prompt_id, True, fields)
+
+    def update(self, prompt_id: str, **fields) -> None:
+        """更新记录，参数同ArtifactDB.update_artifact"""
+        self._put(prompt_id, False, fields)
+
+    def _put(self, prompt_id: str, insert: bool, fields: dict) -> None:
+        if self._thread is None:
+            # 后台线程未启动或已停止时直接写入
+            writes = OrderedDict()
+            self._merge(writes, prompt_id, insert, fields)
+            self._commit(self._to_writes(writes))
+            return
+        self._queue.put(('write', prompt_id, insert, fields))
+
+    def flush(self, timeout: float = None) -> bool:
+        """等待此前放入队列的写入全部提交
+
+        Returns:
+            bool: 是否在超时前完成
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        self._queue.put(('flush', done, None, None))
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 10) -> None:
+        """落盘剩余写入并停止后台线程"""
+        if self._thread is None:
+            return
+        self._queue.put(('stop', None, None, None))
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # 在一个很短的窗口内继续收集写入，凑成一批
+            deadline = time.monotonic() + WRITE_BATCH_WINDOW
+            while len(batch) < WRITE_BATCH_SIZE and item[0] != 'stop':
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            writes = OrderedDict()
+            events = []
+            stop = False
+            for kind, key, insert, fields in batch:
+                if kind == 'write':
+                    self._merge(writes, key, insert, fields)
+                elif kind == 'flush':
+                    events.append(key)
+                else:
+                    stop = True
+
+            if writes:
+                self._commit(self._to_writes(writes))
+            for event in events:
+                event.set()
+            if stop:
+                break
+
+    @staticmethod
+    def _merge(writes: OrderedDict, prompt_id: str, insert: bool, fields: dict) -> None:
+        """合并同一prompt_id的写入
+
+        新增只在记录不存在时生效，保留第一次新增的字段；更新按顺序覆盖。
+        """
+        op = writes.setdefault(prompt_id, {'insert': None, 'update': {}})
+        if insert:
+            if op['insert'] is None:
+                op['insert'] = dict(fields)
+        else:
+            op['update'].update(fields)
+
+    @staticmethod
+    def _to_writes(writes: OrderedDict):
+        return [(prompt_id, op['insert'], op['update']) for prompt_id, op in writes.items()]
+
+    def _commit(self, writes) -> None:
+        """提交一批写入
+
+        整批失败（数据库忙重试耗尽除外）时拆开逐条在各自的事务中重试，只丢弃失败的那一条，
+        不让一条坏数据连累同批其他prompt的状态和输出。
+        """
+        error, busy = self._apply(writes)
+        if error is None:
+            self._notify([prompt_id for prompt_id, _, _ in writes])
+            return
+        if busy or len(writes) == 1:
+            logging.error(f"[Bt-ArtifactGround] 批量写入失败，丢弃{len(writes)}条写入: {str(error)}")
+            return
+
+        logging.warning(f"[Bt-ArtifactGround] 批量写入失败，逐条重试{len(writes)}条写入: {str(error)}")
+        committed = []
+        for write in writes:
+            error, _ = self._apply([write])
+            if error is None:
+                committed.append(write[0])
+            else:
+                logging.error(f"[Bt-ArtifactGround] 写入 {write[0]} 失败，已丢弃: {str(error)}")
+        if committed:
+            self._notify(committed)
+
+    def _apply(self, writes):
+        """在一个事务中执行写入，数据库忙时退避重试
+
+        Returns:
+            (error, busy): 成功时error为None；busy表示失败原因是数据库忙且重试已耗尽
+        """
+        delay = WRITE_RETRY_DELAY
+        for attempt in range(WRITE_MAX_RETRIES + 1):
+            try:
+                self.artifact_db.apply_writes(writes)
+                return None, False
+            except sqlite3.OperationalError as e:
+                message = str(e).lower()
+                busy = 'locked' in message or 'busy' in message
+                if not busy or attempt == WRITE_MAX_RETRIES:
+                    return e, busy
+                logging.warning(f"[Bt-ArtifactGround] 数据库忙，{delay:.1f}秒后重试: {str(e)}")
+                time.sleep(delay)
+                delay *= 2
+            except Exception as e:
+                return e, False
+
+    def _notify(self, prompt_ids) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(prompt_ids)
+            except Exception as e:
+                logging.error(f"[Bt-ArtifactGround] 写入通知失败: {str(e)}")
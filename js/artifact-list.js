@@ -11,6 +11,9 @@ export class ArtifactList {
         this.pageSize = 5;
         this.currentPage = 1;
         this.total = 0;
+        // 每页起始游标，pageCursors[n - 1] 为第n页的游标
+        this.pageCursors = [''];
+        this.nextCursor = null;
 
         // 初始化图片预览组件
         this.imagePreview = new ImagePreview();
@@ -149,6 +152,8 @@ export class ArtifactList {
                                 <option value="2">失败</option>
                             </select>
                             <span class="text-gray-600 dark:text-gray-500 text-xs">|</span>
+                            <input type="search" placeholder="搜索提示词"
+                                class="keyword-input h-7 min-w-0 flex-1 rounded bg-gray-900 px-1.5 text-xs text-gray-100 border-0 focus:ring-1 focus:ring-gray-700 dark:bg-gray-900 dark:text-gray-100 dark:focus:ring-gray-700" />
                             <button class="search-btn h-7 w-7 rounded bg-gray-900 hover:bg-gray-800 active:bg-gray-700 cursor-pointer flex items-center justify-center text-gray-400 hover:text-gray-300">
                                 <svg class="icon" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                                     <circle cx="11" cy="11" r="7"></circle>
@@ -194,6 +199,7 @@ export class ArtifactList {
         const doc = this.frame.contentDocument;
         this.dateInput = doc.querySelector('input[type="date"]');
         this.statusSelect = doc.querySelector('select');
+        this.keywordInput = doc.querySelector('.keyword-input');
         this.artifactList = doc.querySelector('#artifactList > div');
         this.totalCountEl = doc.querySelector('#totalCount');
         this.totalPagesEl = doc.querySelector('#totalPages');
@@ -212,7 +218,8 @@ export class ArtifactList {
         const searchBtn = doc.querySelector('.search-btn');
         if (searchBtn) {
             searchBtn.addEventListener('click', () => {
-                this.loadArtifacts(this.dateInput.value, this.statusSelect.value);
+                this.resetPaging();
+                this.loadArtifacts(this.dateInput.value, this.statusSelect.value, this.keywordInput.value);
             });
         }
 
@@ -221,17 +228,16 @@ export class ArtifactList {
             this.prevPageBtn.addEventListener('click', () => {
                 if (this.currentPage > 1) {
                     this.currentPage--;
-                    this.loadArtifacts(this.dateInput.value, this.statusSelect.value);
+                    this.loadArtifacts(this.dateInput.value, this.statusSelect.value, this.keywordInput.value);
                 }
             });
         }
 
         if (this.nextPageBtn) {
             this.nextPageBtn.addEventListener('click', () => {
-                const totalPages = Math.ceil(this.total / this.pageSize);
-                if (this.currentPage < totalPages) {
+                if (this.nextCursor) {
                     this.currentPage++;
-                    this.loadArtifacts(this.dateInput.value, this.statusSelect.value);
+                    this.loadArtifacts(this.dateInput.value, this.statusSelect.value, this.keywordInput.value);
                 }
             });
         }
@@ -239,20 +245,38 @@ export class ArtifactList {
         // 修改日期和状态选择的事件处理
         if (this.dateInput) {
             this.dateInput.addEventListener('change', () => {
-                this.currentPage = 1;
-                this.loadArtifacts(this.dateInput.value, this.statusSelect.value);
+                this.resetPaging();
+                this.loadArtifacts(this.dateInput.value, this.statusSelect.value, this.keywordInput.value);
             });
         }
 
         if (this.statusSelect) {
             this.statusSelect.addEventListener('change', () => {
-                this.currentPage = 1;
-                this.loadArtifacts(this.dateInput.value, this.statusSelect.value);
+                this.resetPaging();
+                this.loadArtifacts(this.dateInput.value, this.statusSelect.value, this.keywordInput.value);
             });
         }
+
+        // 关键词输入框回车搜索
+        if (this.keywordInput) {
+            this.keywordInput.addEventListener('keydown', (e) => {
+                if (e.key === 'Enter') {
+                    this.resetPaging();
+                    this.loadArtifacts(this.dateInput.value, this.statusSelect.value, this.keywordInput.value);
+                }
+            });
+        }
+    }
+
+    resetPaging() {
+        this.currentPage = 1;
+        this.pageCursors = [''];
+        this.nextCursor = null;
     }
 
-    async loadArtifacts(date = '', status = '') {
+    async loadArtifacts(date = '', status = '', q = '') {
+        // 记录当前筛选条件，推送的新记录只在符合条件时插入
+        this.filters = { date, status, q };
         try {
             const response = await fetch('/bt/artifacts/list', {
                 method: 'POST',
@@ -262,8 +286,10 @@ export class ArtifactList {
                 body: JSON.stringify({
                     date,
                     status,
+                    q,
                     limit: this.pageSize,
-                    offset: (this.currentPage - 1) * this.pageSize
+                    view: 'summary',
+                    cursor: this.pageCursors[this.currentPage - 1] || ''
                 })
             });
 
@@ -274,8 +300,10 @@ export class ArtifactList {
             const result = await response.json();
             
             if (result.code === 0) {
-                const { list, total } = result.data;
+                const { list, total, next_cursor } = result.data;
                 this.total = total;
+                this.nextCursor = next_cursor;
+                this.pageCursors[this.currentPage] = next_cursor;
                 this.artifacts = list;
                 this.renderArtifacts(list);
                 this.renderPagination();
@@ -296,6 +324,71 @@ export class ArtifactList {
         }
     }
 
+    // 应用后端推送的更新：{items: [摘要], deleted: [id]}
+    applyUpdates({ items = [], deleted = [] }) {
+        if (!this.artifactList || !this.artifacts) {
+            return;
+        }
+        const { date = '', status = '', q = '' } = this.filters || {};
+        const newest = this.artifacts.length > 0 ? (this.artifacts[0].created_ts || 0) : 0;
+
+        items.forEach(item => {
+            const index = this.artifacts.findIndex(artifact => artifact.id === item.id);
+            if (index >= 0) {
+                // 已在当前页：原地替换卡片
+                this.artifacts[index] = item;
+                const card = this.artifactList.querySelector(`[data-id="${item.id}"]`);
+                if (card) {
+                    card.replaceWith(this.createArtifactCard(item));
+                }
+                return;
+            }
+            // 新记录：在第一页且符合筛选条件时插入到最前面
+            const matched = this.currentPage === 1 && !q
+                && (!status || status === item.result_status)
+                && (!date || (item.created_at || '').startsWith(date))
+                && (item.created_ts || 0) >= newest;
+            if (matched) {
+                this.artifacts.unshift(item);
+                this.artifactList.prepend(this.createArtifactCard(item));
+                this.total += 1;
+            }
+        });
+
+        // 第一页插入新记录后只保留pageSize条，挤出的记录归入下一页，下一页游标从当前页最后一条重新计算
+        if (this.currentPage === 1 && this.artifacts.length > this.pageSize) {
+            this.artifacts.splice(this.pageSize).forEach(artifact => {
+                const card = this.artifactList.querySelector(`[data-id="${artifact.id}"]`);
+                if (card) {
+                    card.remove();
+                }
+            });
+            this.nextCursor = this.encodeCursor(this.artifacts[this.artifacts.length - 1]);
+            // 后续页的起始位置都已后移，丢弃旧游标，翻页时逐页重新获取
+            this.pageCursors = ['', this.nextCursor];
+        }
+
+        deleted.forEach(id => {
+            const index = this.artifacts.findIndex(artifact => artifact.id === id);
+            if (index >= 0) {
+                this.artifacts.splice(index, 1);
+                const card = this.artifactList.querySelector(`[data-id="${id}"]`);
+                if (card) {
+                    card.remove();
+                }
+                this.total = Math.max(0, this.total - 1);
+            }
+        });
+
+        this.renderPagination();
+    }
+
+    // 与后端ArtifactDB.encode_cursor一致：[created_ts, id]的JSON再做urlsafe base64
+    encodeCursor(artifact) {
+        const raw = JSON.stringify([artifact.created_ts ?? null, artifact.id]);
+        return btoa(raw).replace(/\+/g, '-').replace(/\//g, '_');
+    }
+
     renderArtifacts(artifacts, clear = true) {
         if (clear) {
             this.artifactList.innerHTML = '';
@@ -473,27 +566,55 @@ export class ArtifactList {
     }
 
     getImageUrl(artifact) {
+        const images = this.getArtifactImages(artifact);
+        const output = images.find(image => image.type === 'output');
+        const temp = images.find(image => image.type === 'temp');
+        const image = output || temp;
+        return image ? this.buildViewUrl(image) : '';
+    }
+
+    buildViewUrl(image) {
+        const params = new URLSearchParams({
+            filename: image.filename,
+            subfolder: image.subfolder || '',
+            type: image.type
+        });
+        return `/api/view?${params.toString()}`;
+    }
+
+    // 列表接口返回摘要(images)，详情接口返回完整outputs，两种格式都兼容
+    getArtifactImages(artifact) {
+        if (!artifact) {
+            return [];
+        }
+        if (Array.isArray(artifact.images)) {
+            return artifact.images;
+        }
+        const images = [];
         const outputs = artifact.outputs || {};
-        const imageMap = {};
         for (const nodeId in outputs) {
             const output = outputs[nodeId];
             if (output.images && output.images.length > 0) {
                 output.images.forEach(image => {
-                    const url = `/api/view?filename=${image.filename}&type=${image.type}`;
-                    if (!imageMap[image.type]) { 
-                        imageMap[image.type] = [];
+                    if (image && image.filename) {
+                        images.push({ node_id: nodeId, ...image });
                     }
-                    imageMap[image.type].push(url);
                 });
             }
         }
-        if(imageMap['output']) {
-            return imageMap['output'][0];
+        return images;
+    }
+
+    async fetchArtifactDetail(id) {
+        const response = await fetch(`/bt/artifacts/${id}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
         }
-        if(imageMap['temp']) {
-            return imageMap['temp'][0];
+        const result = await response.json();
+        if (result.code !== 0) {
+            throw new Error(result.msg || '获取记录详情失败');
         }
-        return '';
+        return result.data;
     }
 
     async downloadImage(imageInfo) {
@@ -548,16 +669,17 @@ export class ArtifactList {
             app.ui.showToast('删除成功', 'success');
             
             // 重新加载当前页面的数据
-            await this.loadArtifacts(this.dateInput.value, this.statusSelect.value);
+            await this.loadArtifacts(this.dateInput.value, this.statusSelect.value, this.keywordInput.value);
         } catch (error) {
             console.error('删除记录失败:', error);
             app.ui.showToast('删除记录失败', 'error');
         }
     }
 
-    async loadWorkflow(artifact) {
+    async loadWorkflow(summary) {
         try {
-            const imageUrl = this.getImageUrl(artifact);
+            // 列表只有摘要，加载工作流时再获取完整记录
+            const artifact = await this.fetchArtifactDetail(summary.id);
             if (!artifact.prompt) {
                 throw new Error('找不到对应的生成信息!');
             }
@@ -594,32 +716,14 @@ export class ArtifactList {
             this.prevPageBtn.disabled = this.currentPage <= 1;
         }
         if (this.nextPageBtn) {
-            this.nextPageBtn.disabled = this.currentPage >= totalPages;
+            this.nextPageBtn.disabled = !this.nextCursor;
         }
     }
 
     getAllImageUrls(artifact) {
-        if (!artifact || !artifact.outputs) {
-            return [];
-        }
-        
-        const outputs = artifact.outputs;
-        const urls = [];
-        
-        // 首先添加输出图片
-        for (const nodeId in outputs) {
-            const output = outputs[nodeId];
-            if (output.images && output.images.length > 0) {
-                output.images
-                    .filter(image => image.type === 'output')
-                    .forEach(image => {
-                        if (image && image.filename) {
-                            const url = `/api/view?filename=${image.filename}&type=${image.type}`;
-                            urls.push({url: url, filename: image.filename});
-                        }
-                    });
-            }
-        }
+        const urls = this.getArtifactImages(artifact)
+            .filter(image => image.type === 'output')
+            .map(image => ({url: this.buildViewUrl(image), filename: image.filename}));
         
         // 如果没有找到任何图片，返回一个默认的空图片
         if (urls.length === 0) {
@@ -631,4 +735,4 @@ export class ArtifactList {
         
         return urls;
     }
-} 
\ No newline at end of file
+}
\ No newline at end of file
@@ -153,10 +153,11 @@ app.ui.menuContainer.appendChild((() => {
 app.registerExtension({
     name: "Comfy.ArtifactGround",
     async setup() {
-        // 监听新生成记录的消息
+        // 监听记录的新增、状态变化和删除，侧边栏原地更新卡片
         app.api.addEventListener("artifact_ground_update", (event) => {
-            // 可以在这里添加提示或自动刷新等功能
-            app.ui.showMessage(`新的生成记录已保存: ${event.detail.data.timestamp}`, "success");
+            if (app.artifactList) {
+                app.artifactList.applyUpdates(event.detail || {});
+            }
         });
     }
 });
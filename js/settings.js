@@ -140,7 +140,21 @@ app.registerExtension({
                     step: 1,
                     showButtons: true
                 },
-                tooltip: "同时上传的最大文件数"
+                tooltip: "同时上传的最大文件数,同一上传服务器和Token的所有上传节点共享此上限"
+            },
+            {
+                id: "BtArtifactGround.upload.qps",
+                name: "每秒上传请求数",
+                type: "number",
+                defaultValue: 0,
+                category: ["BtArtifactGround", "上传配置", "每秒请求数"],
+                attrs: {
+                    min: 0,
+                    max: 100,
+                    step: 1,
+                    showButtons: true
+                },
+                tooltip: "同一上传服务器和Token每秒最多发出的上传请求数,0为不限制;服务器返回429时按Retry-After暂停后重试"
             },
             {
                 id: "BtArtifactGround.volc.endpoint",
@@ -198,6 +212,109 @@ app.registerExtension({
                     showButtons: true
                 },
                 tooltip: "火山引擎接口请求超时时间"
+            },
+            {
+                id: "BtArtifactGround.volc.qps",
+                name: "火山引擎每秒请求数",
+                type: "number",
+                defaultValue: 10,
+                category: ["BtArtifactGround", "火山引擎", "每秒请求数"],
+                attrs: {
+                    min: 0,
+                    max: 100,
+                    step: 1,
+                    showButtons: true
+                },
+                tooltip: "同一AccessKey每秒最多发出的提交和查询请求数(所有即梦节点共享),0为不限制;被限流时自动退避重试"
+            },
+            {
+                id: "BtArtifactGround.volc.concurrent",
+                name: "火山引擎并发请求数",
+                type: "number",
+                defaultValue: 10,
+                category: ["BtArtifactGround", "火山引擎", "并发请求数"],
+                attrs: {
+                    min: 0,
+                    max: 100,
+                    step: 1,
+                    showButtons: true
+                },
+                tooltip: "同一AccessKey同时进行的最大请求数(所有即梦节点共享),0为不限制"
+            },
+            {
+                id: "BtArtifactGround.liblib.endpoint",
+                name: "LiblibAI接口地址",
+                type: "text",
+                defaultValue: "https://bridge.liblib.art",
+                category: ["BtArtifactGround", "LiblibAI", "接口地址"],
+                tooltip: "LiblibAI生图接口地址"
+            },
+            {
+                id: "BtArtifactGround.liblib.token",
+                name: "LiblibAI Token",
+                type: "text",
+                defaultValue: "",
+                category: ["BtArtifactGround", "LiblibAI", "Token"],
+                attrs: {
+                    type: "password"
+                },
+                tooltip: "登录LiblibAI网页后请求头中的token"
+            },
+            {
+                id: "BtArtifactGround.liblib.timeout",
+                name: "LiblibAI超时(毫秒)",
+                type: "number",
+                defaultValue: 30000,
+                category: ["BtArtifactGround", "LiblibAI", "超时"],
+                attrs: {
+                    min: 1000,
+                    max: 300000,
+                    step: 1000,
+                    showButtons: true
+                },
+                tooltip: "LiblibAI接口请求超时时间"
+            },
+            {
+                id: "BtArtifactGround.liblib.qps",
+                name: "LiblibAI每秒请求数",
+                type: "number",
+                defaultValue: 2,
+                category: ["BtArtifactGround", "LiblibAI", "每秒请求数"],
+                attrs: {
+                    min: 0,
+                    max: 100,
+                    step: 1,
+                    showButtons: true
+                },
+                tooltip: "同一Token每秒最多发出的提交和查询请求数(所有LiblibAI节点共享),0为不限制;被限流时自动退避重试"
+            },
+            {
+                id: "BtArtifactGround.liblib.concurrent",
+                name: "LiblibAI并发请求数",
+                type: "number",
+                defaultValue: 4,
+                category: ["BtArtifactGround", "LiblibAI", "并发请求数"],
+                attrs: {
+                    min: 0,
+                    max: 100,
+                    step: 1,
+                    showButtons: true
+                },
+                tooltip: "同一Token同时进行的最大请求数(所有LiblibAI节点共享),0为不限制"
+            },
+            {
+                id: "BtArtifactGround.cache.maxSizeMB",
+                name: "结果缓存上限(MB)",
+                type: "number",
+                defaultValue: 2048,
+                category: ["BtArtifactGround", "结果缓存", "缓存上限"],
+                attrs: {
+                    min: 64,
+                    max: 102400,
+                    step: 64,
+                    showButtons: true
+                },
+                tooltip: "即梦、LiblibAI节点固定seed的生成结果缓存在插件data/result_cache目录下,相同请求直接返回缓存,超过上限时淘汰最久未使用的结果"
             }
         ];
 
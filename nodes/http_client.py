@@ -0,0 +1,125 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+import time
+
+import aiohttp
+
+# 连接池总连接数，以及单个host的连接数上限
+HTTP_POOL_LIMIT = 64
+HTTP_POOL_LIMIT_PER_HOST = 16
+# 空闲连接保活时间（秒）
+HTTP_KEEPALIVE_TIMEOUT = 60
+# DNS解析结果缓存时间（秒）
+HTTP_DNS_CACHE_TTL = 300
+# 同步等待协程时调用检查函数的间隔（秒）
+CHECK_INTERVAL = 0.1
+
+
+class HttpClient:
+    """节点共享的后台事件循环和HTTP连接池
+
+    节点在ComfyUI的执行线程中同步运行，通过 run() 把协程提交到常驻后台线程的事件循环中执行并等待结果。
+    所有请求共用一个 ClientSession，复用keep-alive连接，避免每次请求重新做DNS解析、TCP和TLS握手；
+    超时由调用方在每个请求上单独指定。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """启动后台事件循环线程（首次使用时）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._session = None
+                self._thread = threading.Thread(
+                    target=self._run_loop, args=(self._loop,), name="bt-artifact-http", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """获取共享的ClientSession，只能在后台事件循环中调用"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_LIMIT,
+                limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """把协程提交到后台事件循环，立即返回Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro, timeout: float = None, check=None):
+        """在后台事件循环中执行协程并等待结果，协程中的异常原样抛出
+
+        Args:
+            timeout: 最长等待时间（秒），超时后取消协程并抛出 concurrent.futures.TimeoutError
+            check: 等待期间每隔CHECK_INTERVAL秒调用一次，抛出异常时立即取消协程并把异常抛给调用方，
+                用于响应ComfyUI的中断
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("不能在HTTP事件循环线程中同步等待协程")
+        future = self.submit(coro)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while not future.done():
+                wait = None if check is None else CHECK_INTERVAL
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise concurrent.futures.TimeoutError()
+                    wait = remaining if wait is None else min(wait, remaining)
+                concurrent.futures.wait([future], timeout=wait)
+                if check is not None and not future.done():
+                    check()
+        except BaseException:
+            future.cancel()
+            raise
+        return future.result()
+
+    def close(self, timeout: float = 5) -> None:
+        """关闭连接池并停止后台事件循环"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+
+        async def close_session():
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+            self._session = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_session(), loop).result(timeout)
+        except Exception as e:
+            logging.debug(f"[Bt-ArtifactGround] 关闭HTTP连接池失败: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+
+
+http_client = HttpClient()
+atexit.register(http_client.close)
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import queue
+import re
+
+import torch
+
+from .http_client import http_client
+from .jimeng_t2i_v31_node import BtJimengT2IBaseNode
+from .remote_engine import SIZE_MISMATCH_POLICIES, check_interrupted, engine, images_to_batch, submit_pacer
+from .result_cache import result_cache
+
+try:
+    import comfy.utils as comfy_utils
+except ImportError:
+    comfy_utils = None
+
+# 单次批量的最大任务数
+MAX_BATCH_SIZE = 100
+# 完成时预览图的最大边长
+PREVIEW_MAX_SIZE = 512
+
+
+class BtJimengT2IBatchBaseNode(BtJimengT2IBaseNode):
+    """即梦文生图批量节点
+
+    按QPS错开提交所有任务，由共享的轮询器统一查询，完成的任务立即下载解码，
+    总耗时接近最慢的一个任务而不是所有任务之和。每完成一个任务更新一次节点进度并推送预览图。
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "prompts": ("STRING", {"multiline": True, "tooltip": "每行一个提示词"}),
+                "seeds": ("STRING", {"default": "-1", "tooltip": "逗号或换行分隔；一个seed时用于所有提示词，一个提示词时按每个seed各生成一次"}),
+                "width": ("INT", {"default": 1328, "min": 512, "max": 3024, "step": 8}),
+                "height": ("INT", {"default": 1328, "min": 512, "max": 3024, "step": 8}),
+                "use_pre_llm": ("BOOLEAN", {"default": True}),
+                "submit_qps": ("FLOAT", {"default": 2.0, "min": 0.1, "max": 50.0, "step": 0.1}),
+                "poll_interval_ms": ("INT", {"default": 1000, "min": 200, "max": 10000, "step": 100}),
+                "poll_timeout_ms": ("INT", {"default": 300000, "min": 1000, "max": 1800000, "step": 1000}),
+                "return_url": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "req_json": ("STRING", {"default": "", "multiline": True}),
+                "size_mismatch": (SIZE_MISMATCH_POLICIES, {"default": "resize"}),
+                "use_cache": ("BOOLEAN", {"default": True}),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE", "STRING")
+    RETURN_NAMES = ("images", "result")
+    FUNCTION = "generate_batch"
+    CATEGORY = "Bt-ArtifactGround"
+
+    @staticmethod
+    def _parse_batch(prompts: str, seeds: str):
+        """解析提示词和seed列表
+
+        Returns:
+            (items, error)
+        """
+        prompt_list = [line.strip() for line in (prompts or "").splitlines() if line.strip()]
+        if not prompt_list:
+            return None, "提示词为空"
+        try:
+            seed_list = [int(value) for value in re.split(r"[\s,，]+", (seeds or "").strip()) if value]
+        except ValueError:
+            return None, f"seed格式错误: {seeds}"
+        if any(seed < -1 or seed > 2147483647 for seed in seed_list):
+            return None, "seed超出范围"
+        seed_list = seed_list or [-1]
+
+        if len(seed_list) == 1:
+            seed_list = seed_list * len(prompt_list)
+        elif len(prompt_list) == 1:
+            prompt_list = prompt_list * len(seed_list)
+        elif len(seed_list) != len(prompt_list):
+            return None, f"seed数量({len(seed_list)})与提示词数量({len(prompt_list)})不一致"
+        if len(prompt_list) > MAX_BATCH_SIZE:
+            return None, f"单次最多{MAX_BATCH_SIZE}个任务"
+        return [
+            {"index": index, "prompt": prompt, "seed": seed}
+            for index, (prompt, seed) in enumerate(zip(prompt_list, seed_list))
+        ], None
+
+    @staticmethod
+    def _item_result(item: dict) -> dict:
+        """单个任务在result中的信息"""
+        result = {
+            key: item[key]
+            for key in ("index", "prompt", "seed", "task_id", "cached", "error", "elapsed_ms",
+                        "image_urls", "image_timings")
+            if item.get(key) is not None
+        }
+        result["image_count"] = len(item.get("images") or [])
+        return result
+
+    async def _generate_batch_async(self, items, width, height, use_pre_llm, submit_qps,
+                                    poll_interval_ms, poll_timeout_ms, req_json, settings, use_cache, on_done):
+        """批量生成，结果写回items中的每一项，每完成一项（成功或失败）调用一次on_done(item)
+
+        命中缓存的任务不占用提交配额，相同的请求（固定seed）合并为一个远程任务。
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        backend = self._backend()
+        pace = submit_pacer(submit_qps)
+
+        async def run(item):
+            request = self._request(item["prompt"], width, height, item["seed"], use_pre_llm, req_json)
+            try:
+                images, result, error = await engine.generate(
+                    backend, request, settings, poll_interval_ms, poll_timeout_ms, use_cache, before_submit=pace
+                )
+            except Exception as e:
+                # 单项的意外异常只记为该项失败，不取消其他项，已生成的图片照常返回
+                logging.error(f"批量生成第{item['index'] + 1}项失败: {str(e)}")
+                images, result, error = None, None, str(e)
+            result = result or {}
+            item["task_id"] = result.get("task_id")
+            item["cached"] = result.get("cached")
+            item["image_urls"] = result.get("image_urls")
+            item["image_timings"] = result.get("image_timings")
+            item["images"] = images
+            item["error"] = error
+            item["elapsed_ms"] = round((loop.time() - started) * 1000)
+            on_done(item)
+
+        tasks = [asyncio.ensure_future(run(item)) for item in items]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def generate_batch(
+        self,
+        prompts,
+        seeds,
+        width,
+        height,
+        use_pre_llm,
+        submit_qps,
+        poll_interval_ms,
+        poll_timeout_ms,
+        return_url,
+        req_json="",
+        size_mismatch="resize",
+        use_cache=True,
+    ):
+        settings = self._build_settings()
+        if not settings["access_key"] or not settings["secret_key"]:
+            return (torch.zeros((1, 64, 64, 3)), "未配置火山引擎AccessKeyId/SecretAccessKey")
+
+        items, error = self._parse_batch(prompts, seeds)
+        if error:
+            return (torch.zeros((1, 64, 64, 3)), error)
+
+        if return_url and not req_json:
+            req_json = json.dumps({"return_url": True}, ensure_ascii=False)
+        result_cache.max_bytes = int(settings["cache_max_mb"]) * 1024 * 1024
+
+        # 完成的任务由事件循环放入队列，在执行线程中更新进度（ComfyUI的进度回调依赖执行线程的上下文）
+        completed = queue.SimpleQueue()
+        progress = comfy_utils.ProgressBar(len(items)) if comfy_utils is not None else None
+        done = 0
+
+        def drain():
+            nonlocal done
+            while True:
+                try:
+                    item = completed.get_nowait()
+                except queue.Empty:
+                    return
+                done += 1
+                if progress is not None:
+                    preview = ("JPEG", item["images"][0], PREVIEW_MAX_SIZE) if item["images"] else None
+                    progress.update_absolute(done, len(items), preview)
+
+        def check():
+            check_interrupted()
+            drain()
+
+        http_client.run(
+            self._generate_batch_async(
+                items, width, height, use_pre_llm, submit_qps, poll_interval_ms, poll_timeout_ms,
+                req_json, settings, use_cache, completed.put,
+            ),
+            check=check,
+        )
+        drain()
+
+        images = [image for item in items for image in (item.get("images") or [])]
+        result = {
+            "count": len(items),
+            "success": sum(1 for item in items if item.get("images")),
+            "failed": sum(1 for item in items if not item.get("images")),
+            "image_count": len(images),
+            "items": [self._item_result(item) for item in items],
+        }
+        if not images:
+            return (torch.zeros((1, 64, 64, 3)), json.dumps(result, ensure_ascii=False))
+
+        sizes = {image.size for image in images}
+        if len(sizes) > 1:
+            logging.warning(f"返回的图片尺寸不一致: {sorted(sizes)}，按 {size_mismatch} 处理")
+            result["size_mismatch"] = size_mismatch
+        batch = images_to_batch(images, size_mismatch)
+        return (batch, json.dumps(result, ensure_ascii=False))
+
+
+class BtJimengT2IV31BatchNode(BtJimengT2IBatchBaseNode):
+    REQ_KEY = "jimeng_t2i_v31"
+
+
+class BtJimengT2IV30BatchNode(BtJimengT2IBatchBaseNode):
+    REQ_KEY = "jimeng_t2i_v30"
+
+
+class BtJimengT2IV40BatchNode(BtJimengT2IBatchBaseNode):
+    REQ_KEY = "jimeng_t2i_v40"
@@ -1,23 +1,29 @@
-import asyncio
-import base64
-import datetime
-import hashlib
-import hmac
-import io
 import json
 import logging
-import time
-import urllib.parse
 
 import aiohttp
-from PIL import Image
-import numpy as np
 import torch
 import server
 
+from .http_client import http_client
+from .rate_limiter import get_limiter, mask_credential
+from .remote_engine import (
+    SIZE_MISMATCH_POLICIES,
+    RemoteBackend,
+    check_interrupted,
+    engine,
+    images_to_batch,
+    request_json,
+)
+from .result_cache import result_cache
+from .volc_signer import get_signer
+
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# 火山引擎表示限流（QPS超限、并发超限）的业务错误码
+THROTTLE_CODES = {50429, 50430}
+
 user_manager = server.PromptServer.instance.user_manager
 user_settings = user_manager.settings
 
@@ -29,6 +35,100 @@ class FakeRequest:
             self.headers = headers
 
 
+class JimengBackend(RemoteBackend):
+    """即梦（火山引擎视觉服务）异步接口：CVSync2AsyncSubmitTask 提交任务，CVSync2AsyncGetResult 查询结果"""
+
+    name = "volc"
+
+    def __init__(self, req_key: str):
+        self.req_key = req_key
+
+    async def _post(self, action: str, body: dict, settings: dict):
+        """调用火山引擎接口
+
+        所有节点对同一AccessKey的调用共用一个限流器，被限流时暂停该限流器后重试，每次重试重新签名（X-Date需要是当前时间）。
+        """
+        query = {"Action": action, "Version": "2022-08-31"}
+        body_bytes = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        signer = get_signer(settings)
+        limiter = get_limiter(
+            "volc", settings["access_key"], settings["qps"], settings["concurrent"],
+            name=mask_credential(settings["access_key"]),
+        )
+        return await request_json(
+            limiter, "POST", signer.url(query), body_bytes,
+            headers=lambda: signer.sign("POST", "/", query, body_bytes),
+            timeout=aiohttp.ClientTimeout(total=settings["timeout_ms"] / 1000),
+            throttled=lambda data: data.get("code") in THROTTLE_CODES,
+        )
+
+    def cache_request(self, request: dict):
+        """seed为-1（每次随机）时不缓存，req_json中的return_url只影响图片的返回方式，不参与缓存key"""
+        seed = request.get("seed")
+        if seed is None or seed < 0:
+            return None
+        req_json = request.get("req_json")
+        extra = {}
+        if req_json:
+            try:
+                extra = json.loads(req_json)
+            except json.JSONDecodeError:
+                extra = req_json
+            if isinstance(extra, dict):
+                extra = {k: v for k, v in extra.items() if k != "return_url"}
+        return {
+            "req_key": self.req_key,
+            "prompt": request["prompt"],
+            "width": request["width"],
+            "height": request["height"],
+            "seed": seed,
+            "use_pre_llm": request["use_pre_llm"],
+            "req_json": extra,
+        }
+
+    async def submit(self, request: dict, settings: dict):
+        body = {
+            "req_key": self.req_key,
+            "prompt": request["prompt"],
+            "seed": request["seed"],
+        }
+        if request["width"] and request["height"]:
+            body["width"] = request["width"]
+            body["height"] = request["height"]
+        if request["use_pre_llm"] is not None:
+            body["use_pre_llm"] = request["use_pre_llm"]
+
+        data, error = await self._post("CVSync2AsyncSubmitTask", body, settings)
+        if error:
+            return None, error
+        if data.get("code") != 10000:
+            return None, f"提交任务失败: {data.get('message', '未知错误')}"
+        task_id = data.get("data", {}).get("task_id")
+        if not task_id:
+            return None, "未获取到task_id"
+        return task_id, None
+
+    async def query(self, task_id, request: dict, settings: dict):
+        body = {
+            "req_key": self.req_key,
+            "task_id": task_id,
+        }
+        if request.get("req_json"):
+            body["req_json"] = request["req_json"]
+
+        data, error = await self._post("CVSync2AsyncGetResult", body, settings)
+        if error:
+            return None, error
+        if data.get("code") != 10000:
+            return None, f"查询任务失败: {data.get('message', '未知错误')}"
+        result_data = data.get("data") or {}
+        status = result_data.get("status")
+        state = {**result_data, "done": status == "done"}
+        if status in {"not_found", "expired"}:
+            state["error"] = f"任务状态异常: {status}"
+        return state, None
+
+
 class BtJimengT2IBaseNode:
     REQ_KEY = "jimeng_t2i_v31"
 
@@ -50,6 +150,8 @@ class BtJimengT2IBaseNode:
             },
             "optional": {
                 "req_json": ("STRING", {"default": "", "multiline": True}),
+                "size_mismatch": (SIZE_MISMATCH_POLICIES, {"default": "resize"}),
+                "use_cache": ("BOOLEAN", {"default": True}),
             },
         }
 
@@ -71,185 +173,28 @@ class BtJimengT2IBaseNode:
             "service": self.get_comfyui_user_setting("BtArtifactGround.volc.service", "cv"),
             "endpoint": self.get_comfyui_user_setting("BtArtifactGround.volc.endpoint", self.base_url),
             "timeout_ms": self.get_comfyui_user_setting("BtArtifactGround.volc.timeout", 30000),
+            "qps": self.get_comfyui_user_setting("BtArtifactGround.volc.qps", 10),
+            "concurrent": self.get_comfyui_user_setting("BtArtifactGround.volc.concurrent", 10),
+            "cache_max_mb": self.get_comfyui_user_setting("BtArtifactGround.cache.maxSizeMB", 2048),
         }
 
-    def _sha256_hex(self, data: bytes) -> str:
-        return hashlib.sha256(data).hexdigest()
-
-    def _hmac_sha256(self, key: bytes, msg: str) -> bytes:
-        return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
-
-    def _quote(self, value: str) -> str:
-        return urllib.parse.quote(value, safe="-_.~")
-
-    def _canonical_query(self, params: dict) -> str:
-        items = []
-        for key in sorted(params.keys()):
-            value = params[key]
-            if value is None:
-                continue
-            items.append(f"{self._quote(str(key))}={self._quote(str(value))}")
-        return "&".join(items)
-
-    def _build_auth_headers(self, method: str, path: str, query: dict, body: bytes, settings: dict):
-        now = datetime.datetime.utcnow()
-        x_date = now.strftime("%Y%m%dT%H%M%SZ")
-        date_stamp = now.strftime("%Y%m%d")
-
-        host = urllib.parse.urlparse(settings["endpoint"]).netloc
-        content_type = "application/json"
-        payload_hash = self._sha256_hex(body)
-
-        canonical_query = self._canonical_query(query)
-        canonical_headers = "\n".join(
-            [
-                f"content-type:{content_type}",
-                f"host:{host}",
-                f"x-content-sha256:{payload_hash}",
-                f"x-date:{x_date}",
-            ]
-        ) + "\n"
-        signed_headers = "content-type;host;x-content-sha256;x-date"
-        canonical_request = "\n".join(
-            [
-                method,
-                path,
-                canonical_query,
-                canonical_headers,
-                signed_headers,
-                payload_hash,
-            ]
-        )
-
-        credential_scope = f"{date_stamp}/{settings['region']}/{settings['service']}/request"
-        string_to_sign = "\n".join(
-            [
-                "HMAC-SHA256",
-                x_date,
-                credential_scope,
-                self._sha256_hex(canonical_request.encode("utf-8")),
-            ]
-        )
-
-        k_date = self._hmac_sha256(settings["secret_key"].encode("utf-8"), date_stamp)
-        k_region = hmac.new(k_date, settings["region"].encode("utf-8"), hashlib.sha256).digest()
-        k_service = hmac.new(k_region, settings["service"].encode("utf-8"), hashlib.sha256).digest()
-        k_signing = hmac.new(k_service, b"request", hashlib.sha256).digest()
-        signature = hmac.new(k_signing, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    def _backend(self) -> JimengBackend:
+        return JimengBackend(self.REQ_KEY)
 
-        authorization = (
-            f"HMAC-SHA256 Credential={settings['access_key']}/{credential_scope}, "
-            f"SignedHeaders={signed_headers}, Signature={signature}"
-        )
-
-        headers = {
-            "Content-Type": content_type,
-            "Host": host,
-            "X-Date": x_date,
-            "X-Content-Sha256": payload_hash,
-            "Authorization": authorization,
-        }
-        return headers
-
-    async def _post(self, action: str, body: dict, settings: dict):
-        query = {"Action": action, "Version": "2022-08-31"}
-        body_bytes = json.dumps(body, ensure_ascii=False).encode("utf-8")
-        headers = self._build_auth_headers("POST", "/", query, body_bytes, settings)
-
-        url = f"{settings['endpoint'].rstrip('/')}/?{self._canonical_query(query)}"
-        timeout = aiohttp.ClientTimeout(total=settings["timeout_ms"] / 1000)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(url, data=body_bytes, headers=headers) as response:
-                text = await response.text()
-                if response.status != 200:
-                    return None, f"HTTP错误: {response.status} - {text}"
-                try:
-                    data = json.loads(text)
-                except json.JSONDecodeError:
-                    return None, f"响应解析失败: {text}"
-                return data, None
-
-    async def _submit_task(self, prompt, width, height, seed, use_pre_llm, settings):
-        body = {
-            "req_key": self.REQ_KEY,
+    @staticmethod
+    def _request(prompt, width, height, seed, use_pre_llm, req_json):
+        return {
             "prompt": prompt,
+            "width": width,
+            "height": height,
             "seed": seed,
+            "use_pre_llm": use_pre_llm,
+            "req_json": req_json,
         }
-        if width and height:
-            body["width"] = width
-            body["height"] = height
-        if use_pre_llm is not None:
-            body["use_pre_llm"] = use_pre_llm
-
-        data, error = await self._post("CVSync2AsyncSubmitTask", body, settings)
-        if error:
-            return None, error
-        if data.get("code") != 10000:
-            return None, f"提交任务失败: {data.get('message', '未知错误')}"
-        task_id = data.get("data", {}).get("task_id")
-        if not task_id:
-            return None, "未获取到task_id"
-        return task_id, None
-
-    async def _query_task(self, task_id, settings, req_json=None):
-        body = {
-            "req_key": self.REQ_KEY,
-            "task_id": task_id,
-        }
-        if req_json:
-            body["req_json"] = req_json
-
-        data, error = await self._post("CVSync2AsyncGetResult", body, settings)
-        if error:
-            return None, error
-        if data.get("code") != 10000:
-            return None, f"查询任务失败: {data.get('message', '未知错误')}"
-        return data.get("data", {}), None
-
-    async def _fetch_image_bytes(self, session: aiohttp.ClientSession, url: str):
-        async with session.get(url) as response:
-            if response.status != 200:
-                raise RuntimeError(f"图片下载失败: {response.status}")
-            return await response.read()
-
-    async def _collect_images(self, result_data):
-        images = []
-        if result_data.get("binary_data_base64"):
-            for item in result_data["binary_data_base64"]:
-                data = base64.b64decode(item)
-                img = Image.open(io.BytesIO(data)).convert("RGB")
-                images.append(img)
-        elif result_data.get("image_urls"):
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                for url in result_data["image_urls"]:
-                    data = await self._fetch_image_bytes(session, url)
-                    img = Image.open(io.BytesIO(data)).convert("RGB")
-                    images.append(img)
-        return images
-
-    def _pil_to_tensor(self, image: Image.Image):
-        array = np.array(image).astype(np.float32) / 255.0
-        return torch.from_numpy(array)[None, ...]
 
     def _run_async(self, coro):
-        try:
-            loop = asyncio.get_running_loop()
-            import concurrent.futures
-
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(self._run_in_new_loop, coro)
-                return future.result()
-        except RuntimeError:
-            return self._run_in_new_loop(coro)
-
-    def _run_in_new_loop(self, coro):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(coro)
-        finally:
-            loop.close()
+        """在共享的后台事件循环中执行协程，复用连接池中的连接，ComfyUI中断时立即取消"""
+        return http_client.run(coro, check=check_interrupted)
 
     def generate(
         self,
@@ -262,6 +207,8 @@ class BtJimengT2IBaseNode:
         poll_timeout_ms,
         return_url,
         req_json="",
+        size_mismatch="resize",
+        use_cache=True,
     ):
         settings = self._build_settings()
         if not settings["access_key"] or not settings["secret_key"]:
@@ -270,41 +217,25 @@ class BtJimengT2IBaseNode:
         if return_url and not req_json:
             req_json = json.dumps({"return_url": True}, ensure_ascii=False)
 
-        task_id, error = self._run_async(
-            self._submit_task(prompt, width, height, seed, use_pre_llm, settings)
+        result_cache.max_bytes = int(settings["cache_max_mb"]) * 1024 * 1024
+        images, result, error = self._run_async(
+            engine.generate(
+                self._backend(), self._request(prompt, width, height, seed, use_pre_llm, req_json), settings,
+                poll_interval_ms, poll_timeout_ms, use_cache,
+            )
         )
         if error:
             return (torch.zeros((1, 64, 64, 3)), error)
 
-        deadline = time.monotonic() + poll_timeout_ms / 1000.0
-
-        while True:
-            result_data, query_error = self._run_async(self._query_task(task_id, settings, req_json))
-            if query_error:
-                return (torch.zeros((1, 64, 64, 3)), query_error)
-
-            status = result_data.get("status")
-            if status == "done":
-                images = self._run_async(self._collect_images(result_data))
-                if not images:
-                    return (torch.zeros((1, 64, 64, 3)), "未返回图片数据")
-                tensors = [self._pil_to_tensor(img) for img in images]
-                batch = torch.cat(tensors, dim=0)
-                result = {
-                    "task_id": task_id,
-                    "status": status,
-                    "image_count": len(images),
-                    "image_urls": result_data.get("image_urls"),
-                }
-                return (batch, json.dumps(result, ensure_ascii=False))
-
-            if status in {"not_found", "expired"}:
-                return (torch.zeros((1, 64, 64, 3)), f"任务状态异常: {status}")
-
-            if time.monotonic() > deadline:
-                return (torch.zeros((1, 64, 64, 3)), "任务超时未完成")
-
-            time.sleep(poll_interval_ms / 1000.0)
+        # 合并的请求共享同一个结果
+        result = dict(result)
+
+        sizes = {image.size for image in images}
+        if len(sizes) > 1:
+            logging.warning(f"返回的图片尺寸不一致: {sorted(sizes)}，按 {size_mismatch} 处理")
+            result["size_mismatch"] = size_mismatch
+        batch = images_to_batch(images, size_mismatch)
+        return (batch, json.dumps(result, ensure_ascii=False))
 
 
 class BtJimengT2IV31Node(BtJimengT2IBaseNode):
@@ -0,0 +1,289 @@
+import json
+import logging
+import time
+
+import aiohttp
+import torch
+import server
+
+from .http_client import http_client
+from .rate_limiter import get_limiter, mask_credential
+from .remote_engine import (
+    SIZE_MISMATCH_POLICIES,
+    RemoteBackend,
+    check_interrupted,
+    engine,
+    images_to_batch,
+    request_json,
+)
+from .result_cache import result_cache
+
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# 网页生图接口的固定参数：文生图
+GENERATE_TYPE = 65
+BIZ_TYPE = 22
+SOURCE = 0
+# 可选的模型：checkpointId、baseType 和 geniusPayload 中的模型名
+LIBLIB_MODELS = {
+    "Seedream 4.0": {
+        "checkpoint_id": 21627436,
+        "base_type": 30,
+        "model": "doubao-seedream-4-0-250828",
+    },
+}
+
+user_manager = server.PromptServer.instance.user_manager
+user_settings = user_manager.settings
+
+
+class FakeRequest:
+    def __init__(self, headers=None):
+        self.headers = {"comfy-user": "default"}
+        if headers:
+            self.headers = headers
+
+
+def _parse_req_json(req_json):
+    if not req_json:
+        return {}
+    try:
+        extra = json.loads(req_json)
+    except json.JSONDecodeError:
+        return req_json
+    return extra
+
+
+class LiblibBackend(RemoteBackend):
+    """LiblibAI网页生图接口：generate/image 提交任务，generate/progress/msg/v3/{id} 查询进度"""
+
+    name = "liblib"
+
+    def _url(self, settings: dict, path: str) -> str:
+        return f"{settings['endpoint'].rstrip('/')}/gateway/sd-api/{path}?timestamp={int(time.time() * 1000)}"
+
+    async def _post(self, path: str, body: dict, settings: dict):
+        """调用LiblibAI接口，所有节点对同一Token的调用共用一个限流器"""
+        limiter = get_limiter(
+            "liblib", settings["token"], settings["qps"], settings["concurrent"],
+            name=mask_credential(settings["token"]),
+        )
+        return await request_json(
+            limiter, "POST", self._url(settings, path), json.dumps(body, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json", "token": settings["token"]},
+            timeout=aiohttp.ClientTimeout(total=settings["timeout_ms"] / 1000),
+        )
+
+    def cache_request(self, request: dict):
+        """seed为-1（每次随机）时不缓存"""
+        seed = request.get("seed")
+        if seed is None or seed < 0:
+            return None
+        return {
+            "provider": self.name,
+            "model": request["model"],
+            "prompt": request["prompt"],
+            "width": request["width"],
+            "height": request["height"],
+            "seed": seed,
+            "count": request["count"],
+            "prompt_magic": request["prompt_magic"],
+            "req_json": _parse_req_json(request.get("req_json")),
+        }
+
+    @staticmethod
+    def _payload(request: dict) -> dict:
+        """提交任务的请求体
+
+        req_json为JSON对象时合并到请求体，其中的geniusPayload对象合并到模型参数。
+        """
+        model = LIBLIB_MODELS[request["model"]]
+        prompt, width, height, count = request["prompt"], request["width"], request["height"], request["count"]
+        extra = _parse_req_json(request.get("req_json"))
+        extra = dict(extra) if isinstance(extra, dict) else {}
+
+        genius = {
+            "model": model["model"],
+            "prompt": prompt,
+            "n": count,
+            "width": width,
+            "height": height,
+            "size": f"{width}x{height}",
+            "sequential_image_generation": "disabled",
+            "promptOptimizeMode": "standard",
+            "quality": "2",
+            "images": [],
+            "effects": [],
+        }
+        if request["seed"] >= 0:
+            genius["seed"] = request["seed"]
+        genius.update(extra.pop("geniusPayload", None) or {})
+
+        payload = {
+            "checkpointId": model["checkpoint_id"],
+            "promptMagic": 1 if request["prompt_magic"] else 0,
+            "generateType": GENERATE_TYPE,
+            "source": SOURCE,
+            "bizType": BIZ_TYPE,
+            "taskQueuePriority": 1,
+            "originalPrompt": prompt,
+            "referenceList": [],
+            "additionalNetwork": [],
+            "vae": "",
+            "frontCustomerReq": {
+                "overallStore": {
+                    "generatorData": {
+                        "prompt": prompt,
+                        "count": count,
+                        "width": width,
+                        "height": height,
+                        "taskQueuePriority": 1,
+                        "baseType": model["base_type"],
+                        "checkpointId": model["checkpoint_id"],
+                        "modelName": request["model"],
+                    },
+                },
+            },
+            "prompt": "",
+        }
+        payload.update(extra)
+        payload["geniusPayload"] = json.dumps(genius, ensure_ascii=False)
+        return payload
+
+    async def submit(self, request: dict, settings: dict):
+        data, error = await self._post("generate/image", self._payload(request), settings)
+        if error:
+            return None, error
+        if data.get("code") != 0:
+            return None, f"提交任务失败: {data.get('msg') or '未知错误'}"
+        task_id = data.get("data")
+        if not task_id:
+            return None, "未获取到任务ID"
+        return str(task_id), None
+
+    async def query(self, task_id, request: dict, settings: dict):
+        body = {"flag": 0, "bizType": BIZ_TYPE, "source": SOURCE}
+        data, error = await self._post(f"generate/progress/msg/v3/{task_id}", body, settings)
+        if error:
+            return None, error
+        if data.get("code") != 0:
+            return None, f"查询任务失败: {data.get('msg') or '未知错误'}"
+        info = data.get("data") or {}
+        stage = (info.get("statusInfo") or {}).get("generateStageEnum")
+        state = {"status": stage, "progress": info.get("percentCompleted"), "done": False}
+        if info.get("errorMsg") or info.get("errCode") or (stage and "FAIL" in stage):
+            state["error"] = f"任务失败: {info.get('errorMsg') or info.get('errCode') or stage}"
+            return state, None
+
+        # 生成完成后图片保存完毕才会返回images，illegal不为0的图片未通过内容审核
+        images = info.get("images")
+        if stage == "FINISH" and images is not None:
+            urls = [
+                image.get("originalPath") or image.get("previewPath")
+                for image in images
+                if not image.get("illegal") and (image.get("originalPath") or image.get("previewPath"))
+            ]
+            if not urls:
+                state["error"] = "图片未通过内容审核" if images else "未返回图片数据"
+                return state, None
+            state["done"] = True
+            state["image_urls"] = urls
+        return state, None
+
+
+class BtLiblibT2INode:
+    """LiblibAI文生图，提交、轮询、下载解码和结果缓存与即梦节点共用 RemoteEngine"""
+
+    def __init__(self):
+        self.base_url = "https://bridge.liblib.art"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "prompt": ("STRING", {"multiline": True}),
+                "model": (list(LIBLIB_MODELS.keys()), {"default": "Seedream 4.0"}),
+                "width": ("INT", {"default": 1728, "min": 512, "max": 4096, "step": 8}),
+                "height": ("INT", {"default": 2304, "min": 512, "max": 4096, "step": 8}),
+                "seed": ("INT", {"default": -1, "min": -1, "max": 2147483647}),
+                "count": ("INT", {"default": 1, "min": 1, "max": 4}),
+                "prompt_magic": ("BOOLEAN", {"default": True}),
+                "poll_interval_ms": ("INT", {"default": 1000, "min": 200, "max": 10000, "step": 100}),
+                "poll_timeout_ms": ("INT", {"default": 300000, "min": 1000, "max": 1800000, "step": 1000}),
+            },
+            "optional": {
+                "req_json": ("STRING", {"default": "", "multiline": True}),
+                "size_mismatch": (SIZE_MISMATCH_POLICIES, {"default": "resize"}),
+                "use_cache": ("BOOLEAN", {"default": True}),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE", "STRING")
+    RETURN_NAMES = ("images", "result")
+    FUNCTION = "generate"
+    CATEGORY = "Bt-ArtifactGround"
+
+    def get_comfyui_user_setting(self, key, default=None):
+        req = FakeRequest()
+        all_settings = user_settings.get_settings(req)
+        return all_settings.get(key, default)
+
+    def _build_settings(self):
+        return {
+            "token": self.get_comfyui_user_setting("BtArtifactGround.liblib.token", ""),
+            "endpoint": self.get_comfyui_user_setting("BtArtifactGround.liblib.endpoint", self.base_url),
+            "timeout_ms": self.get_comfyui_user_setting("BtArtifactGround.liblib.timeout", 30000),
+            "qps": self.get_comfyui_user_setting("BtArtifactGround.liblib.qps", 2),
+            "concurrent": self.get_comfyui_user_setting("BtArtifactGround.liblib.concurrent", 4),
+            "cache_max_mb": self.get_comfyui_user_setting("BtArtifactGround.cache.maxSizeMB", 2048),
+        }
+
+    def generate(
+        self,
+        prompt,
+        model,
+        width,
+        height,
+        seed,
+        count,
+        prompt_magic,
+        poll_interval_ms,
+        poll_timeout_ms,
+        req_json="",
+        size_mismatch="resize",
+        use_cache=True,
+    ):
+        settings = self._build_settings()
+        if not settings["token"]:
+            return (torch.zeros((1, 64, 64, 3)), "未配置LiblibAI Token")
+        if model not in LIBLIB_MODELS:
+            return (torch.zeros((1, 64, 64, 3)), f"不支持的模型: {model}")
+
+        request = {
+            "prompt": prompt,
+            "model": model,
+            "width": width,
+            "height": height,
+            "seed": seed,
+            "count": count,
+            "prompt_magic": prompt_magic,
+            "req_json": req_json,
+        }
+        result_cache.max_bytes = int(settings["cache_max_mb"]) * 1024 * 1024
+        images, result, error = http_client.run(
+            engine.generate(LiblibBackend(), request, settings, poll_interval_ms, poll_timeout_ms, use_cache),
+            check=check_interrupted,
+        )
+        if error:
+            return (torch.zeros((1, 64, 64, 3)), error)
+
+        # 合并的请求共享同一个结果
+        result = dict(result)
+
+        sizes = {image.size for image in images}
+        if len(sizes) > 1:
+            logging.warning(f"返回的图片尺寸不一致: {sorted(sizes)}，按 {size_mismatch} 处理")
+            result["size_mismatch"] = size_mismatch
+        batch = images_to_batch(images, size_mismatch)
+        return (batch, json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,239 @@
+import asyncio
+import collections
+import contextlib
+import email.utils
+import hashlib
+import logging
+import random
+import threading
+import time
+
+# 被限流且服务端没有给出等待时间时的初始退避和上限（秒）
+THROTTLE_BASE_DELAY = 1.0
+THROTTLE_MAX_DELAY = 30.0
+# 被限流后的最大重试次数
+THROTTLE_MAX_RETRIES = 5
+# 被限流后按临时速率逐个放行：初始为限流前速率的一半（不低于下限），之后每秒约增加RECOVERY_STEP，
+# 再次被限流时减半，临时速率达到设置的qps后恢复正常
+RECOVERY_MIN_QPS = 0.5
+RECOVERY_STEP = 1.0
+
+
+def retry_after_seconds(headers):
+    """解析Retry-After响应头（秒数或HTTP日期），没有时返回None"""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def throttle_delay(attempt: int, hint: float = None) -> float:
+    """第attempt次（从0开始）被限流后的等待时间：优先使用服务端提示，否则指数退避加随机抖动"""
+    if hint is not None:
+        return min(hint, THROTTLE_MAX_DELAY)
+    return min(THROTTLE_BASE_DELAY * 2 ** attempt, THROTTLE_MAX_DELAY) * random.uniform(0.5, 1.0)
+
+
+def mask_credential(value: str) -> str:
+    """凭证只显示首尾，用于限流器名称"""
+    value = value or ""
+    return f"{value[:4]}***{value[-4:]}" if len(value) > 8 else "***"
+
+
+class RateLimiter:
+    """令牌桶限速加并发上限
+
+    同一服务商的同一凭证共用一个限流器，跨节点、跨执行生效。只能在共享的HTTP事件循环中使用。
+    qps为0时不限速，concurrency为0时不限并发；被限流时 throttled() 暂停所有调用直到指定时间，
+    暂停结束后按临时速率逐个放行等待的调用，避免同时涌向服务端再次被限流。
+    """
+
+    def __init__(self, name: str, qps: float = 0, concurrency: int = 0):
+        self.name = name
+        self.qps = 0.0
+        self.concurrency = 0
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        # 被限流后的临时速率，0表示未处于恢复期；最近1秒内放行的时间，用于估计不限速时的实际速率
+        self._recovery_qps = 0.0
+        self._granted = collections.deque()
+        # 每次被限流加一，排队中的调用据此按新的速率重新排队
+        self._throttle_epoch = 0
+        self._waiters = collections.deque()
+        # 计数：等待并发名额、等待令牌（含限流暂停）、执行中，以及累计完成数和被限流次数
+        self.queued = 0
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.throttled_count = 0
+        self.configure(qps, concurrency)
+
+    def configure(self, qps: float, concurrency: int) -> None:
+        self.qps = max(0.0, float(qps or 0))
+        self.concurrency = max(0, int(concurrency or 0))
+        # 并发上限调大后唤醒等待者
+        self._wake()
+
+    def _wake(self) -> None:
+        free = self.concurrency - self.in_flight if self.concurrency else len(self._waiters)
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def _acquire_slot(self) -> None:
+        while self.concurrency and self.in_flight >= self.concurrency:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # 已被唤醒却取消时，把名额让给下一个等待者
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+        self.in_flight += 1
+
+    def _rate(self) -> float:
+        """当前生效的速率，恢复期内取临时速率和设置的qps中较小的一个，0为不限速"""
+        if self._recovery_qps and self.qps:
+            return min(self._recovery_qps, self.qps)
+        return self._recovery_qps or self.qps
+
+    def _grant(self, now: float) -> None:
+        self._granted.append(now)
+        while self._granted and self._granted[0] <= now - 1:
+            self._granted.popleft()
+        if self._recovery_qps:
+            # 加性增长：持续放行时临时速率每秒约增加RECOVERY_STEP
+            self._recovery_qps += RECOVERY_STEP / self._recovery_qps
+            if self.qps and self._recovery_qps >= self.qps:
+                self._recovery_qps = 0.0
+
+    async def _take_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            rate = self._rate()
+            if not rate:
+                self._grant(now)
+                return
+            self._tokens = min(max(1.0, rate), self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            # 预占令牌，不足时按欠缺的数量排队等待，先到先得
+            self._tokens -= 1
+            if self._tokens >= 0:
+                self._grant(now)
+                return
+            epoch = self._throttle_epoch
+            try:
+                await asyncio.sleep(-self._tokens / rate)
+            except asyncio.CancelledError:
+                if epoch == self._throttle_epoch:
+                    self._tokens += 1
+                raise
+            # 等待期间被限流时令牌已重置，按暂停时间和临时速率重新排队
+            if epoch == self._throttle_epoch:
+                self._grant(time.monotonic())
+                return
+
+    async def acquire(self) -> None:
+        self.queued += 1
+        try:
+            await self._acquire_slot()
+        finally:
+            self.queued -= 1
+        self.waiting += 1
+        try:
+            await self._take_token()
+        except BaseException:
+            self.in_flight -= 1
+            self._wake()
+            raise
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+        self._wake()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """占用一个并发名额和一个令牌"""
+        await self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def throttled(self, delay: float) -> None:
+        """服务端返回限流时调用，delay秒内暂停发出新的调用，之后按减半的临时速率放行"""
+        self.throttled_count += 1
+        self._throttle_epoch += 1
+        now = time.monotonic()
+        if now >= self._paused_until:
+            # 同一次暂停中陆续返回的限流响应只减速一次
+            while self._granted and self._granted[0] <= now - 1:
+                self._granted.popleft()
+            current = self._rate() or len(self._granted)
+            self._recovery_qps = max(RECOVERY_MIN_QPS, current / 2)
+        self._paused_until = max(self._paused_until, now + delay)
+        # 暂停结束时只有一个令牌，之后按临时速率补充
+        self._tokens = 1.0
+        self._updated = self._paused_until
+        logging.warning(
+            f"[Bt-ArtifactGround] {self.name} 请求被限流，暂停{delay:.1f}秒后按{self._rate():.1f}次/秒恢复"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "qps": self.qps,
+            "concurrency": self.concurrency,
+            "queued": self.queued,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "throttled": self.throttled_count,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 1),
+            "recovery_qps": round(self._recovery_qps, 1),
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str, credential: str, qps: float, concurrency: int, name: str = None) -> RateLimiter:
+    """按服务商和凭证获取进程内共享的限流器，并按最新的设置更新限速和并发上限
+
+    Args:
+        credential: 完整凭证，按其sha256区分限流器，脱敏后首尾相同的不同凭证互不影响
+        name: 显示名称，凭证为密钥时传入脱敏后的值，默认显示credential
+    """
+    key = (provider, hashlib.sha256((credential or "").encode("utf-8")).hexdigest())
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(f"{provider}:{credential if name is None else name}", qps, concurrency)
+            return limiter
+    limiter.configure(qps, concurrency)
+    return limiter
+
+
+def limiter_stats() -> list:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
@@ -0,0 +1,504 @@
+import asyncio
+import base64
+import concurrent.futures
+import heapq
+import io
+import itertools
+import json
+import logging
+import random
+import time
+
+import aiohttp
+from PIL import Image
+import numpy as np
+import torch
+
+from .http_client import http_client
+from .rate_limiter import THROTTLE_MAX_RETRIES, retry_after_seconds, throttle_delay
+from .result_cache import RequestCoalescer, cache_key, result_cache
+
+try:
+    import comfy.model_management as model_management
+except ImportError:
+    model_management = None
+
+# 轮询间隔：任务状态不变时每次乘以增长倍数，最长不超过上限（秒），每次等待加入随机抖动
+POLL_BACKOFF_FACTOR = 1.5
+POLL_MAX_INTERVAL = 5.0
+POLL_JITTER = 0.2
+# 查询任务时连续出错（网络错误、HTTP错误、重试后仍被限流等）的最大容忍次数
+POLL_MAX_ERRORS = 3
+# 所有任务合计同时进行的查询请求数
+POLL_CONCURRENCY = 16
+# 图片并发下载数、流式读取的块大小和单张图片的最大字节数
+DOWNLOAD_CONCURRENCY = 4
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+MAX_IMAGE_BYTES = 64 * 1024 * 1024
+# 解码图片的线程数，PIL解码时会释放GIL
+DECODE_WORKERS = 4
+# 返回图片尺寸不一致时的处理方式：resize-缩放到第一张的尺寸 pad-黑边补齐到最大宽高
+SIZE_MISMATCH_POLICIES = ["resize", "pad"]
+
+decode_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=DECODE_WORKERS, thread_name_prefix="bt-remote-decode"
+)
+
+
+def check_interrupted():
+    """ComfyUI中断执行时抛出InterruptProcessingException"""
+    if model_management is not None:
+        model_management.throw_exception_if_processing_interrupted()
+
+
+async def request_json(limiter, method: str, url: str, body: bytes = None, headers=None,
+                       timeout: aiohttp.ClientTimeout = None, throttled=None):
+    """经限流器发送请求并解析JSON响应
+
+    被限流（HTTP 429或throttled(data)为真）时按服务端提示（Retry-After）或指数退避暂停该限流器后重试。
+
+    Args:
+        headers: 请求头，或每次尝试时调用的函数（如每次重新签名）
+        throttled: 判断业务错误码是否表示限流的函数
+
+    Returns:
+        (data, error)
+    """
+    session = await http_client.get_session()
+    for attempt in range(THROTTLE_MAX_RETRIES + 1):
+        async with limiter.slot():
+            request_headers = headers() if callable(headers) else headers
+            async with session.request(method, url, data=body, headers=request_headers, timeout=timeout) as response:
+                status = response.status
+                hint = retry_after_seconds(response.headers)
+                text = await response.text()
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = None
+        is_throttled = status == 429 or (isinstance(data, dict) and throttled is not None and throttled(data))
+        if is_throttled and attempt < THROTTLE_MAX_RETRIES:
+            limiter.throttled(throttle_delay(attempt, hint))
+            continue
+        if status != 200:
+            return None, f"HTTP错误: {status} - {text}"
+        if data is None:
+            return None, f"响应解析失败: {text}"
+        return data, None
+
+
+async def fetch_image_bytes(session: aiohttp.ClientSession, url: str):
+    """流式下载图片，已知Content-Length时写入预分配的缓冲区"""
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+        if response.status != 200:
+            raise RuntimeError(f"图片下载失败: {response.status}")
+        length = response.content_length
+        if length is not None and length > MAX_IMAGE_BYTES:
+            raise RuntimeError(f"图片过大: {length}字节")
+        buffer = bytearray(length or 0)
+        size = 0
+        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+            end = size + len(chunk)
+            if end > MAX_IMAGE_BYTES:
+                raise RuntimeError(f"图片过大: 超过{MAX_IMAGE_BYTES}字节")
+            # 预分配范围内原地写入，长度未知或与Content-Length不符时自动扩展
+            buffer[size:end] = chunk
+            size = end
+        del buffer[size:]
+        return buffer
+
+
+def decode_image(data):
+    """解码图片，在线程池中执行
+
+    Returns:
+        (image, decode_ms)
+    """
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    return image, round((time.perf_counter() - started) * 1000, 1)
+
+
+def decode_base64_image(item: str):
+    """解码base64图片，在线程池中执行
+
+    Returns:
+        (image, 字节数, decode_ms)
+    """
+    started = time.perf_counter()
+    data = base64.b64decode(item)
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    return image, len(data), round((time.perf_counter() - started) * 1000, 1)
+
+
+async def collect_images(result_data):
+    """并发下载图片并在线程池中解码
+
+    Args:
+        result_data: 包含 binary_data_base64（base64列表）或 image_urls（URL列表）
+
+    Returns:
+        (images, timings): 图片按返回顺序排列，timings为每张图片的字节数和下载、解码耗时（毫秒）
+    """
+    loop = asyncio.get_running_loop()
+    if result_data.get("binary_data_base64"):
+        sources = result_data["binary_data_base64"]
+
+        async def load(index, item):
+            image, size, decode_ms = await loop.run_in_executor(decode_executor, decode_base64_image, item)
+            return image, {"index": index, "source": "base64", "bytes": size,
+                           "download_ms": 0, "decode_ms": decode_ms}
+    elif result_data.get("image_urls"):
+        sources = result_data["image_urls"]
+        session = await http_client.get_session()
+        semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+        async def load(index, url):
+            async with semaphore:
+                started = time.perf_counter()
+                data = await fetch_image_bytes(session, url)
+                download_ms = round((time.perf_counter() - started) * 1000, 1)
+            image, decode_ms = await loop.run_in_executor(decode_executor, decode_image, data)
+            return image, {"index": index, "source": "url", "bytes": len(data),
+                           "download_ms": download_ms, "decode_ms": decode_ms}
+    else:
+        return [], []
+
+    tasks = [asyncio.ensure_future(load(index, source)) for index, source in enumerate(sources)]
+    try:
+        loaded = await asyncio.gather(*tasks)
+    except BaseException:
+        # 一张失败（或被中断）时取消其余的下载
+        for task in tasks:
+            task.cancel()
+        raise
+    return [image for image, _ in loaded], [timing for _, timing in loaded]
+
+
+def images_to_batch(images, size_mismatch: str = "resize"):
+    """把图片写入一次分配的批量张量
+
+    每张图片的uint8数据在一次运算中完成缩放和类型转换，直接写入张量对应的位置，
+    不产生逐张的float32副本，也不需要再拼接。尺寸不一致时按size_mismatch处理：
+    resize 缩放到第一张的尺寸，pad 以黑边补齐到最大宽高（左上对齐）。
+    """
+    if size_mismatch == "pad":
+        width = max(image.width for image in images)
+        height = max(image.height for image in images)
+    else:
+        width, height = images[0].size
+    shape = (len(images), height, width, 3)
+    if size_mismatch == "pad" and any(image.size != (width, height) for image in images):
+        batch = torch.zeros(shape, dtype=torch.float32)
+    else:
+        batch = torch.empty(shape, dtype=torch.float32)
+    target = batch.numpy()
+    scale = np.float32(1.0 / 255.0)
+    for index, image in enumerate(images):
+        if image.size != (width, height) and size_mismatch != "pad":
+            image = image.resize((width, height), Image.LANCZOS)
+        np.multiply(np.asarray(image), scale, out=target[index, :image.height, :image.width])
+    return batch
+
+
+def submit_pacer(qps: float):
+    """按QPS错开提交时间，返回在每次提交前await的函数，只能在同一个事件循环中使用"""
+    next_at = 0.0
+
+    async def wait():
+        nonlocal next_at
+        now = asyncio.get_running_loop().time()
+        at = max(now, next_at)
+        next_at = at + 1.0 / qps
+        if at > now:
+            await asyncio.sleep(at - now)
+    return wait
+
+
+class RemoteBackend:
+    """远程生成服务的接入方式
+
+    新的服务商只需实现提交和查询，轮询调度、图片下载解码和结果缓存由 RemoteEngine 统一处理。
+    request为节点整理好的请求参数（dict），settings为该服务商的设置。
+    """
+
+    name = "remote"
+
+    def cache_request(self, request: dict):
+        """结果缓存的请求内容，返回None表示不缓存（如seed为-1每次随机）"""
+        return None
+
+    async def submit(self, request: dict, settings: dict):
+        """提交任务
+
+        Returns:
+            (task_id, error)
+        """
+        raise NotImplementedError
+
+    async def query(self, task_id, request: dict, settings: dict):
+        """查询任务
+
+        Returns:
+            (state, error): error为查询本身失败的原因（HTTP错误、业务错误码等），任务可能仍在进行，
+                轮询器会退避后重试；state包含
+                status: 服务商的原始状态，变化时轮询恢复初始间隔
+                done: 是否已完成，完成时还需包含 binary_data_base64 或 image_urls
+                error: 服务商明确返回的任务失败原因（如任务失败、不存在），不再重试（可选）
+        """
+        raise NotImplementedError
+
+
+class _PollEntry:
+    def __init__(self, backend, task_id, request, settings, future, interval, deadline):
+        self.backend = backend
+        self.task_id = task_id
+        self.request = request
+        self.settings = settings
+        self.future = future
+        self.base_interval = interval
+        self.max_interval = max(interval, POLL_MAX_INTERVAL)
+        self.interval = interval
+        self.deadline = deadline
+        self.status = None
+        self.errors = 0
+
+
+class TaskPoller:
+    """所有远程任务共用的轮询调度器
+
+    未完成的任务按下次查询时间放在一个堆中，由一个协程统一调度，同时进行的查询不超过POLL_CONCURRENCY个。
+    每个任务初始间隔为poll_interval_ms，状态不变时按POLL_BACKOFF_FACTOR增长到POLL_MAX_INTERVAL，
+    状态变化（如排队→生成中）时恢复初始间隔；查询本身出错（网络错误或backend返回error）时按原间隔退避，
+    连续POLL_MAX_ERRORS次以内重试，只有服务商明确返回任务失败时才立即结束。
+    只能在共享的HTTP事件循环中使用。
+    """
+
+    def __init__(self, concurrency: int = POLL_CONCURRENCY):
+        self.concurrency = concurrency
+        self._heap = []
+        self._order = itertools.count()
+        self._queries = set()
+        self._runner = None
+        self._wakeup = None
+        self._semaphore = None
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": sum(1 for _, _, entry in self._heap if not entry.future.done()),
+            "querying": len(self._queries),
+        }
+
+    async def wait(self, backend: RemoteBackend, task_id, request: dict, settings: dict,
+                   poll_interval_ms: int, poll_timeout_ms: int):
+        """等待任务完成
+
+        Returns:
+            (state, error)
+        """
+        loop = asyncio.get_running_loop()
+        entry = _PollEntry(
+            backend, task_id, request, settings, loop.create_future(),
+            poll_interval_ms / 1000.0, loop.time() + poll_timeout_ms / 1000.0,
+        )
+        self._schedule(entry, loop.time())
+        try:
+            return await entry.future
+        finally:
+            # 等待方被取消时不再查询该任务
+            if not entry.future.done():
+                entry.future.cancel()
+
+    def _schedule(self, entry: _PollEntry, at: float) -> None:
+        heapq.heappush(self._heap, (at, next(self._order), entry))
+        if self._runner is None:
+            self._wakeup = asyncio.Event()
+            self._semaphore = self._semaphore or asyncio.Semaphore(self.concurrency)
+            self._runner = asyncio.ensure_future(self._run())
+        else:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._heap:
+            at, _, entry = self._heap[0]
+            if entry.future.done():
+                heapq.heappop(self._heap)
+                continue
+            delay = at - loop.time()
+            if delay > 0:
+                # 新任务加入时提前醒来重新计算
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            task = asyncio.ensure_future(self._query(entry))
+            self._queries.add(task)
+            task.add_done_callback(self._queries.discard)
+        # 堆为空时退出，查询中的任务重新排期时会再次启动
+        self._runner = None
+
+    @staticmethod
+    def _resolve(entry: _PollEntry, state, error) -> None:
+        if not entry.future.done():
+            entry.future.set_result((state, error))
+
+    async def _query(self, entry: _PollEntry) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            if entry.future.done():
+                return
+            try:
+                state, error = await entry.backend.query(entry.task_id, entry.request, entry.settings)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                state, error = None, f"查询任务失败: {str(e)}"
+            except Exception as e:
+                if not entry.future.done():
+                    entry.future.set_exception(e)
+                return
+            if error:
+                # 查询失败（5xx、网关错误、重试后仍被限流等）不代表任务失败，远程任务可能仍在进行
+                entry.errors += 1
+                if entry.errors > POLL_MAX_ERRORS:
+                    self._resolve(entry, None, error)
+                    return
+                logging.warning(f"查询任务 {entry.task_id} 出错，稍后重试: {error}")
+                status = entry.status
+            else:
+                entry.errors = 0
+                if state.get("error"):
+                    self._resolve(entry, None, state["error"])
+                    return
+                if state.get("done"):
+                    self._resolve(entry, state, None)
+                    return
+                status = state.get("status")
+
+        if entry.future.done():
+            return
+        now = loop.time()
+        if now >= entry.deadline:
+            self._resolve(entry, None, "任务超时未完成")
+            return
+        if status != entry.status:
+            entry.interval = entry.base_interval
+            entry.status = status
+        else:
+            entry.interval = min(entry.interval * POLL_BACKOFF_FACTOR, entry.max_interval)
+        delay = entry.interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+        self._schedule(entry, min(now + delay, entry.deadline))
+
+
+class RemoteEngine:
+    """远程生成：提交任务、由共享的轮询器等待完成、下载解码图片
+
+    固定seed的请求先查本地缓存，同时进行的相同请求合并为一个远程任务。只能在共享的HTTP事件循环中使用。
+    """
+
+    def __init__(self):
+        self.poller = TaskPoller()
+        self._coalescer = RequestCoalescer()
+
+    async def _generate_remote(self, backend: RemoteBackend, request: dict, settings: dict,
+                               poll_interval_ms: int, poll_timeout_ms: int, before_submit=None):
+        """
+        Returns:
+            (images, result, error)
+        """
+        if before_submit is not None:
+            await before_submit()
+        try:
+            task_id, error = await backend.submit(request, settings)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            task_id, error = None, f"提交任务失败: {str(e)}"
+        if error:
+            return None, None, error
+
+        state, error = await self.poller.wait(backend, task_id, request, settings, poll_interval_ms, poll_timeout_ms)
+        if error:
+            return None, {"task_id": task_id}, error
+
+        try:
+            images, timings = await collect_images(state)
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError, OSError) as e:
+            return None, {"task_id": task_id}, f"图片下载失败: {str(e)}"
+        if not images:
+            return None, {"task_id": task_id}, "未返回图片数据"
+        result = {
+            "task_id": task_id,
+            "status": state.get("status"),
+            "image_count": len(images),
+            "image_urls": state.get("image_urls"),
+            "image_timings": timings,
+        }
+        return images, result, None
+
+    @staticmethod
+    def load_cached(key: str):
+        """读取缓存的结果，在线程池中执行
+
+        Returns:
+            (images, result)，未命中时返回None
+        """
+        started = time.perf_counter()
+        cached = result_cache.get(key)
+        if cached is None:
+            return None
+        images, meta = cached
+        result = {
+            "task_id": meta.get("task_id"),
+            "status": "done",
+            "image_count": len(images),
+            "image_urls": meta.get("image_urls"),
+            "cached": True,
+            "cache_key": key,
+            "cache_load_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        return images, result
+
+    async def _generate_and_store(self, key, cache_request, *args):
+        """远程生成并写入缓存，写入失败不影响返回结果"""
+        images, result, error = await self._generate_remote(*args)
+        if error:
+            return images, result, error
+        meta = {
+            "request": cache_request,
+            "task_id": result.get("task_id"),
+            "image_urls": result.get("image_urls"),
+        }
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(decode_executor, result_cache.put, key, images, meta)
+        except Exception as e:
+            logging.warning(f"写入结果缓存失败: {str(e)}")
+        return images, {**result, "cache_key": key}, None
+
+    async def generate(self, backend: RemoteBackend, request: dict, settings: dict,
+                       poll_interval_ms: int, poll_timeout_ms: int, use_cache: bool = True, before_submit=None):
+        """生成图片
+
+        Args:
+            before_submit: 提交前await的函数（如批量时按QPS错开），命中缓存或合并到已有任务时不调用
+
+        Returns:
+            (images, result, error)，合并的请求共享同一个result，修改前需要复制
+        """
+        args = (backend, request, settings, poll_interval_ms, poll_timeout_ms, before_submit)
+        cache_request = backend.cache_request(request) if use_cache else None
+        if cache_request is None:
+            return await self._generate_remote(*args)
+
+        key = cache_key(cache_request)
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(decode_executor, self.load_cached, key)
+        if cached is not None:
+            logging.info(f"命中结果缓存 {key[:12]}")
+            images, result = cached
+            return images, result, None
+        return await self._coalescer.run(key, lambda: self._generate_and_store(key, cache_request, *args))
+
+
+engine = RemoteEngine()
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from PIL import Image
+
+# 缓存目录：插件目录下的 data/result_cache
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "data", "result_cache")
+# 默认缓存上限（MB）
+DEFAULT_MAX_SIZE_MB = 2048
+# PNG压缩级别：缓存以读写速度优先
+PNG_COMPRESS_LEVEL = 1
+META_FILE = "meta.json"
+
+
+def cache_key(request: dict) -> str:
+    """请求的规范化JSON的sha256"""
+    canonical = json.dumps(request, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """远程生成结果的本地缓存
+
+    每个请求一个目录：图片保存为PNG，请求和结果信息保存在 meta.json 中。
+    按总大小做LRU淘汰，命中时更新 meta.json 的修改时间，启动后首次使用时按修改时间重建顺序。
+    读写都是阻塞IO，应在线程池中调用。
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = DEFAULT_MAX_SIZE_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> 占用字节数，按最近使用排序
+        self._index = None
+        self._total = 0
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def _load_index(self) -> None:
+        """扫描缓存目录建立LRU索引，清理写入中断留下的临时目录"""
+        if self._index is not None:
+            return
+        entries = []
+        os.makedirs(self.root, exist_ok=True)
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            meta_path = os.path.join(entry.path, META_FILE)
+            if entry.name.startswith(".") or not os.path.exists(meta_path):
+                shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            entries.append((os.path.getmtime(meta_path), entry.name, self._dir_size(entry.path)))
+        self._index = OrderedDict()
+        self._total = 0
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+
+    def get(self, key: str):
+        """读取缓存
+
+        Returns:
+            (images, meta)，未命中时返回None
+        """
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        path = self._entry_dir(key)
+        try:
+            with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            images = []
+            for filename in meta["files"]:
+                with Image.open(os.path.join(path, filename)) as image:
+                    images.append(image.convert("RGB"))
+            os.utime(os.path.join(path, META_FILE))
+            return images, meta
+        except Exception as e:
+            logging.warning(f"[Bt-ArtifactGround] 读取结果缓存失败，丢弃缓存 {key}: {str(e)}")
+            self._remove(key)
+            return None
+
+    def put(self, key: str, images, meta: dict) -> None:
+        """写入缓存：先写临时目录再改名，中断时不会留下不完整的缓存"""
+        with self._lock:
+            self._load_index()
+        tmp_path = os.path.join(self.root, f".tmp-{key}-{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        try:
+            files = []
+            for index, image in enumerate(images):
+                filename = f"image_{index}.png"
+                image.save(os.path.join(tmp_path, filename), format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+                files.append(filename)
+            meta = {**meta, "files": files, "cached_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+            with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            size = self._dir_size(tmp_path)
+            with self._lock:
+                path = self._entry_dir(key)
+                if key in self._index:
+                    # 同一请求已被其他调用写入
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    return
+                os.replace(tmp_path, path)
+                self._index[key] = size
+                self._total += size
+                evicted = self._evict()
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        for evicted_key in evicted:
+            shutil.rmtree(self._entry_dir(evicted_key), ignore_errors=True)
+
+    def _evict(self) -> list:
+        """淘汰最久未使用的缓存直到不超过上限（至少保留最新一条），调用方需持有锁
+
+        Returns:
+            list: 被淘汰的key，由调用方在锁外删除目录
+        """
+        evicted = []
+        while self._total > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            evicted.append(key)
+        if evicted:
+            logging.info(f"[Bt-ArtifactGround] 结果缓存超过上限，淘汰{len(evicted)}条")
+        return evicted
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            size = self._index.pop(key, None)
+            if size is not None:
+                self._total -= size
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+
+class RequestCoalescer:
+    """合并同时进行的相同请求
+
+    同一key只执行一次，所有调用方共享结果；只有全部调用方都取消时才取消执行。
+    只能在同一个事件循环中使用。
+    """
+
+    def __init__(self):
+        # key -> [task, 等待的调用方数量]
+        self._inflight = {}
+
+    async def run(self, key: str, factory):
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logging.info(f"[Bt-ArtifactGround] 合并进行中的相同请求 {key[:12]}")
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not entry[0].done():
+                entry[0].cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+
+result_cache = ResultCache()
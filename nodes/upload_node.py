@@ -9,7 +9,10 @@ import folder_paths
 import logging
 import server
 import uuid
+from urllib.parse import urlparse
 from ..tool import command_ui_alert
+from .http_client import http_client
+from .rate_limiter import get_limiter, mask_credential, retry_after_seconds, throttle_delay
 import datetime
 # 配置日志格式
 logging.basicConfig(
@@ -68,28 +71,17 @@ class BtUploadImageNode:
         all_settings = user_settings.get_settings(req)
         return all_settings.get(key,default)
     
+    def _get_limiter(self, settings):
+        """同一上传服务器的同一Token共用的限流器，并发上限即设置中的并发上传数，跨节点、跨执行生效"""
+        netloc = urlparse(settings['url']).netloc
+        return get_limiter(
+            "upload", f"{netloc}\n{settings['token']}", settings['qps'], settings['concurrent'],
+            name=f"{netloc}:{mask_credential(settings['token'])}",
+        )
+
     def _run_async_upload(self, saved_paths, settings, material_category):
-        """安全地运行异步上传任务"""
-        try:
-            # 尝试获取当前事件循环
-            loop = asyncio.get_running_loop()
-            # 如果已经有运行中的事件循环，使用 asyncio.create_task
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(self._run_in_new_loop, saved_paths, settings, material_category)
-                return future.result()
-        except RuntimeError:
-            # 没有运行中的事件循环，创建新的
-            return self._run_in_new_loop(saved_paths, settings, material_category)
-    
-    def _run_in_new_loop(self, saved_paths, settings, material_category):
-        """在新的事件循环中运行异步任务"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(self.do_upload_images(saved_paths, settings, material_category))
-        finally:
-            loop.close()
+        """在共享的后台事件循环中运行异步上传任务"""
+        return http_client.run(self.do_upload_images(saved_paths, settings, material_category))
     
     async def upload_image(self, file_path, settings, material_category="默认分类"):
         """异步上传单个文件"""
@@ -121,52 +113,57 @@ class BtUploadImageNode:
 
             # 发送请求
             timeout = aiohttp.ClientTimeout(total=settings['timeout'] / 1000)  # 转换为秒
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                for attempt in range(settings['retryCount'] + 1):
-                    try:
-                        logging.info(f"正在进行第 {attempt + 1} 次尝试上传...")
-                        async with session.post(settings['url'], data=data, headers=headers) as response:
-                            status = response.status
-                            logging.info(f"响应状态码: {status}")
+            session = await http_client.get_session()
+            limiter = self._get_limiter(settings)
+            for attempt in range(settings['retryCount'] + 1):
+                try:
+                    logging.info(f"正在进行第 {attempt + 1} 次尝试上传...")
+                    async with limiter.slot(), session.post(settings['url'], data=data, headers=headers, timeout=timeout) as response:
+                        status = response.status
+                        logging.info(f"响应状态码: {status}")
                             
-                            if status == 200:
-                                result = await response.json()
-                                if result.get('success'):
-                                    # 解析成功结果
-                                    data = result.get('data', {})
-                                    success_files = data.get('success_files', [])
-                                    material_ids = data.get('material_ids', [])
+                        if status == 429 and attempt < settings['retryCount']:
+                            # 被限流：按服务端提示暂停该服务器的所有上传后重试
+                            limiter.throttled(throttle_delay(attempt, retry_after_seconds(response.headers)))
+                            continue
+                        if status == 200:
+                            result = await response.json()
+                            if result.get('success'):
+                                # 解析成功结果
+                                data = result.get('data', {})
+                                success_files = data.get('success_files', [])
+                                material_ids = data.get('material_ids', [])
                                     
-                                    success_info = {
-                                        'url': success_files[0] if success_files else None,
-                                        'material_id': material_ids[0] if material_ids else None,
-                                        'filename': success_files[0] if success_files else None
-                                    }
+                                success_info = {
+                                    'url': success_files[0] if success_files else None,
+                                    'material_id': material_ids[0] if material_ids else None,
+                                    'filename': success_files[0] if success_files else None
+                                }
                                     
-                                    logging.info(f"上传成功 - 文件: {filename}")
-                                    logging.info(f"文件URL: {success_info['url']}")
-                                    logging.info(f"素材ID: {success_info['material_id']}")
-                                    logging.info(f"服务器响应: {json.dumps(result, ensure_ascii=False, indent=2)}")
-                                    return True, success_info
-                                else:
-                                    error_msg = result.get('msg', '未知错误')
-                                    logging.error(f"上传失败 - 文件: {filename}")
-                                    logging.error(f"错误信息: {error_msg}")
-                                    if attempt == settings['retryCount']:
-                                        return False, f"业务处理失败: {error_msg}"
+                                logging.info(f"上传成功 - 文件: {filename}")
+                                logging.info(f"文件URL: {success_info['url']}")
+                                logging.info(f"素材ID: {success_info['material_id']}")
+                                logging.info(f"服务器响应: {json.dumps(result, ensure_ascii=False, indent=2)}")
+                                return True, success_info
                             else:
-                                error_text = await response.text()
+                                error_msg = result.get('msg', '未知错误')
                                 logging.error(f"上传失败 - 文件: {filename}")
-                                logging.error(f"错误响应: {error_text}")
+                                logging.error(f"错误信息: {error_msg}")
                                 if attempt == settings['retryCount']:
-                                    return False, f"HTTP错误: {status} - {error_text}"
-                    except Exception as e:
-                        logging.error(f"上传出错 - 文件: {filename}")
-                        logging.error(f"错误信息: {str(e)}")
-                        if attempt == settings['retryCount']:
-                            return False, f"请求异常: {str(e)}"
-                        logging.info(f"等待 1 秒后进行重试...")
-                        await asyncio.sleep(1)  # 重试前等待1秒
+                                    return False, f"业务处理失败: {error_msg}"
+                        else:
+                            error_text = await response.text()
+                            logging.error(f"上传失败 - 文件: {filename}")
+                            logging.error(f"错误响应: {error_text}")
+                            if attempt == settings['retryCount']:
+                                return False, f"HTTP错误: {status} - {error_text}"
+                except Exception as e:
+                    logging.error(f"上传出错 - 文件: {filename}")
+                    logging.error(f"错误信息: {str(e)}")
+                    if attempt == settings['retryCount']:
+                        return False, f"请求异常: {str(e)}"
+                    logging.info(f"等待 1 秒后进行重试...")
+                    await asyncio.sleep(1)  # 重试前等待1秒
 
         except Exception as e:
             logging.error(f"文件处理错误 - 文件: {filename}")
@@ -247,6 +244,7 @@ class BtUploadImageNode:
                 "timeout": self.get_comfyui_user_setting("BtArtifactGround.upload.timeout", 30000),
                 "retryCount": self.get_comfyui_user_setting("BtArtifactGround.upload.retryCount", 3),
                 "concurrent": self.get_comfyui_user_setting("BtArtifactGround.upload.concurrent", 3),
+                "qps": self.get_comfyui_user_setting("BtArtifactGround.upload.qps", 0),
                 
                 # OSS配置
                 "oss": {
@@ -421,11 +419,12 @@ class BtUploadImageNode:
                             'Content-Type': 'image/png',
                             # 'x-oss-storage-class': 'Standard'
                         }
-                        result = bucket.put_object(
-                            object_name, 
-                            file_content,
-                            headers=headers
-                        )
+                    # oss2是同步客户端，放到线程池执行，避免阻塞共享的事件循环
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(
+                        None,
+                        lambda: bucket.put_object(object_name, file_content, headers=headers)
+                    )
                     
                     logging.info(f"OSS 上传结果 - 请求ID: {result.request_id}")
                     logging.info(f"OSS 上传结果 - ETag: {result.etag}")
@@ -481,29 +480,34 @@ class BtUploadImageNode:
             
             # 发送请求
             timeout = aiohttp.ClientTimeout(total=settings['timeout'] / 1000)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                for attempt in range(settings['retryCount'] + 1):
-                    try:
-                        async with session.post(settings['url'], data=data, headers=headers) as response:
-                            status = response.status
-                            if status == 200:
-                                result = await response.json()
-                                if result.get('success'):
-                                    data = result.get('data', {})
-                                    success_files = data.get('success_files', [])
-                                    material_ids = data.get('material_ids', [])
+            session = await http_client.get_session()
+            limiter = self._get_limiter(settings)
+            for attempt in range(settings['retryCount'] + 1):
+                try:
+                    async with limiter.slot(), session.post(settings['url'], data=data, headers=headers, timeout=timeout) as response:
+                        status = response.status
+                        if status == 429 and attempt < settings['retryCount']:
+                            # 被限流：按服务端提示暂停该服务器的所有上传后重试
+                            limiter.throttled(throttle_delay(attempt, retry_after_seconds(response.headers)))
+                            continue
+                        if status == 200:
+                            result = await response.json()
+                            if result.get('success'):
+                                data = result.get('data', {})
+                                success_files = data.get('success_files', [])
+                                material_ids = data.get('material_ids', [])
                                     
-                                    success_info = {
-                                        'url': url,  # 使用 OSS URL
-                                        'material_id': material_ids[0] if material_ids else None,
-                                        'filename': filename
-                                    }
-                                    return True, success_info
-                            return False, f"提交 OSS URL 失败: {await response.text()}"
-                    except Exception as e:
-                        if attempt == settings['retryCount']:
-                            return False, f"提交 OSS URL 异常: {str(e)}"
-                        await asyncio.sleep(1)
+                                success_info = {
+                                    'url': url,  # 使用 OSS URL
+                                    'material_id': material_ids[0] if material_ids else None,
+                                    'filename': filename
+                                }
+                                return True, success_info
+                        return False, f"提交 OSS URL 失败: {await response.text()}"
+                except Exception as e:
+                    if attempt == settings['retryCount']:
+                        return False, f"提交 OSS URL 异常: {str(e)}"
+                    await asyncio.sleep(1)
             return False, "提交 OSS URL 失败: 超过重试次数"
         except Exception as e:
             return False, f"提交 OSS URL 处理错误: {str(e)}" 
\ No newline at end of file
@@ -0,0 +1,79 @@
+import logging
+import threading
+import time
+
+import server
+from .database.manager import db_manager
+
+prompt_server = server.PromptServer.instance
+
+# 推送给前端的消息类型
+UPDATE_EVENT = 'artifact_ground_update'
+# 合并推送的时间窗口（秒）
+PUSH_INTERVAL = 0.5
+
+
+class ArtifactNotifier:
+    """把记录的新增、状态变化和删除推送给前端
+
+    写入队列每提交一批就登记变化的prompt_id，在PUSH_INTERVAL内合并，
+    然后一次查询摘要，通过send_sync发送一条消息，前端据此原地更新卡片。
+    """
+
+    def __init__(self, server_instance, artifact_db):
+        self.server = server_instance
+        self.artifact_db = artifact_db
+        self._lock = threading.Lock()
+        self._changed = set()
+        self._deleted = set()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="bt-artifact-notifier", daemon=True)
+        self._thread.start()
+
+    def changed(self, prompt_ids) -> None:
+        """登记新增或更新的记录"""
+        with self._lock:
+            self._changed.update(prompt_ids)
+        self._wakeup.set()
+
+    def deleted(self, artifact_id: int) -> None:
+        """登记删除的记录"""
+        with self._lock:
+            self._deleted.add(artifact_id)
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            # 等待一个窗口，把这段时间内的变化合并成一条消息
+            time.sleep(PUSH_INTERVAL)
+            self._wakeup.clear()
+            with self._lock:
+                changed, self._changed = self._changed, set()
+                deleted, self._deleted = self._deleted, set()
+            try:
+                self.flush(changed, deleted)
+            except Exception as e:
+                logging.error(f"[Bt-ArtifactGround] 推送记录更新失败: {str(e)}")
+
+    def flush(self, changed, deleted) -> None:
+        items = []
+        if changed:
+            summaries = self.artifact_db.get_summaries_by_prompt_ids(list(changed))
+            items = sorted(summaries.values(), key=lambda item: item['id'])
+        if not items and not deleted:
+            return
+        self.server.send_sync(UPDATE_EVENT, {
+            'items': items,
+            'deleted': sorted(deleted),
+        })
+
+
+artifact_notifier = ArtifactNotifier(prompt_server, db_manager.artifact)
+db_manager.writer.add_listener(artifact_notifier.changed)
+artifact_notifier.start()
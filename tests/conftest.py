@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# 测试直接导入插件的 database、nodes 包，不经过依赖ComfyUI的插件入口
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import ArtifactDB  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """临时目录中已初始化的记录库"""
+    artifact_db = ArtifactDB(str(tmp_path / "artifacts.db"))
+    artifact_db.init_db()
+    yield artifact_db
+    artifact_db.close()
@@ -0,0 +1,47 @@
+from database.blob import document_family, json_diff, json_patch
+
+
+def _prompt(seed, prompt_id):
+    """ComfyUI历史记录中的prompt：(number, prompt_id, 节点图, extra_data, outputs) 元组"""
+    graph = {
+        "3": {"class_type": "KSampler", "inputs": {"seed": seed, "steps": 20, "cfg": 7.0, "model": ["4", 0]}},
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a cat sitting on a red chair, " * 20}},
+    }
+    return (seed, prompt_id, graph, {"client_id": "abc"}, ["9"])
+
+
+def test_tuple_and_list_prompts_share_family():
+    prompt = _prompt(1, "p1")
+    assert document_family(prompt) == document_family(list(prompt))
+    assert document_family(prompt) == document_family(_prompt(2, "p2"))
+
+
+def test_diff_roundtrip():
+    old = {"a": [1, 2, {"b": True}], "c": 1}
+    new = {"a": [1, 3, {"b": False}], "d": "x"}
+    assert json_patch(old, json_diff(old, new)) == new
+    assert json_diff(old, old) is None
+
+
+def test_seed_sweep_of_tuple_prompts_stores_deltas(db):
+    prompts = [_prompt(seed, f"prompt-{seed}") for seed in range(5)]
+    for prompt in prompts:
+        db.save_artifact(prompt[1], meta={"seed": prompt[0]}, prompt=prompt)
+
+    with db.get_read_connection() as conn:
+        families = conn.execute(
+            "SELECT COUNT(DISTINCT family) FROM comfyui_bt_artifact_blob "
+            "WHERE hash IN (SELECT prompt_blob FROM comfyui_bt_artifact)"
+        ).fetchone()[0]
+        blobs = conn.execute("SELECT COUNT(DISTINCT prompt_blob) FROM comfyui_bt_artifact").fetchone()[0]
+        deltas = conn.execute(
+            "SELECT COUNT(*) FROM comfyui_bt_artifact WHERE prompt_delta IS NOT NULL"
+        ).fetchone()[0]
+    assert families == 1
+    assert blobs == 1
+    assert deltas == len(prompts) - 1
+
+    for prompt in prompts:
+        artifact = db.get_artifact_by_prompt_id(prompt[1])
+        assert artifact["prompt"] == list(prompt)
@@ -0,0 +1,64 @@
+import functools
+
+from database.models import ArtifactDB
+from database.models.artifact_migrations import MIGRATIONS
+
+
+def _counts(conn):
+    return dict(((day, status), count) for day, status, count in conn.execute(
+        "SELECT day, result_status, count FROM comfyui_bt_artifact_count WHERE count != 0"
+    ))
+
+
+def _expected(conn):
+    return dict(((day, status), count) for day, status, count in conn.execute('''
+        SELECT COALESCE(DATE(created_ts, 'unixepoch', 'localtime'), ''), COALESCE(result_status, ''), COUNT(*)
+        FROM comfyui_bt_artifact GROUP BY 1, 2
+    '''))
+
+
+def test_counts_rebuild_in_chunks_with_concurrent_writes(db, monkeypatch):
+    monkeypatch.setattr(ArtifactDB, 'rebuild_artifact_counts',
+                        staticmethod(functools.partial(ArtifactDB.rebuild_artifact_counts, batch_size=3)))
+    for index in range(10):
+        db.save_artifact(f"p{index}", result_status=str(index % 3))
+    with db.get_connection() as conn:
+        conn.execute("UPDATE comfyui_bt_artifact SET created_ts = 86400 * 365 * 50 + id * 86400")
+    assert db.migrations.is_pending('counts')
+
+    migration = next(m for m in MIGRATIONS if m.name == 'counts')
+    last_id = 0
+    writes = iter([
+        # 已统计和未统计的记录都有改动，以及回填过程中新增的记录
+        lambda: db.update_result_status("p0", "1"),
+        lambda: db.update_result_status("p8", "1"),
+        lambda: db.save_artifact("new-1", result_status="0"),
+        lambda: db.delete_artifact(db.get_artifact_by_prompt_id("p1")["id"]),
+        lambda: db.delete_artifact(db.get_artifact_by_prompt_id("p9")["id"]),
+    ])
+    chunks = 0
+    while True:
+        with db.get_connection() as conn:
+            next_id = migration.backfill(db, conn, last_id)
+            if next_id is not None:
+                conn.execute("UPDATE comfyui_bt_migration SET last_id = ? WHERE version = ?",
+                             (next_id, migration.version))
+        if next_id is None:
+            break
+        last_id = next_id
+        chunks += 1
+        next(writes, lambda: None)()
+    # 最后一批之后、收尾之前新增的记录
+    db.save_artifact("new-2", result_status="1")
+    with db.get_connection() as conn:
+        migration.finish(conn)
+        conn.execute("UPDATE comfyui_bt_migration SET done = 1 WHERE version = ?", (migration.version,))
+    db.migrations.pending.discard('counts')
+
+    assert chunks > 1
+    db.save_artifact("after", result_status="2")
+    db.update_result_status("p2", "0")
+    with db.get_read_connection() as conn:
+        assert _counts(conn) == _expected(conn)
+    assert db.count_artifacts() == 12
+    assert db.count_artifacts(status="1") == len([a for a in db.list_artifacts() if a["result_status"] == "1"])
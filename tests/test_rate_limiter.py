@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from nodes.rate_limiter import RateLimiter, get_limiter, limiter_stats, mask_credential
+
+
+def test_credentials_with_same_mask_use_separate_limiters():
+    first, second = "AKLTabcd1111wxyz", "AKLTabcd2222wxyz"
+    assert mask_credential(first) == mask_credential(second)
+
+    limiter_a = get_limiter("test", first, 1, 1, name=mask_credential(first))
+    limiter_b = get_limiter("test", second, 5, 2, name=mask_credential(second))
+    assert limiter_a is not limiter_b
+    assert (limiter_a.qps, limiter_a.concurrency) == (1, 1)
+    assert get_limiter("test", first, 3, 1, name=mask_credential(first)) is limiter_a
+    assert limiter_a.qps == 3
+
+    # 统计接口只显示脱敏后的名称
+    names = [stats["name"] for stats in limiter_stats()]
+    assert "test:AKLT***wxyz" in names
+    assert not any(first in name or second in name for name in names)
+
+
+def test_waiters_are_paced_after_throttle():
+    async def scenario():
+        limiter = RateLimiter("test:unlimited")
+        # 不限速时限流前1秒内放行了20次
+        for _ in range(20):
+            await limiter.acquire()
+            limiter.release()
+        limiter.throttled(0.2)
+        throttled_at = time.monotonic()
+
+        released = []
+
+        async def call():
+            async with limiter.slot():
+                released.append(time.monotonic() - throttled_at)
+
+        await asyncio.gather(*(call() for _ in range(10)))
+        return limiter, released
+
+    limiter, released = asyncio.run(scenario())
+    released.sort()
+    assert released[0] >= 0.19
+    # 临时速率约为限流前的一半（10次/秒），10个等待者不会在暂停结束时同时放行
+    assert released[-1] - released[0] >= 0.6
+    assert all(b - a >= 0.05 for a, b in zip(released, released[1:]))
+    assert limiter.stats()["recovery_qps"] > 10
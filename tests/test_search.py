@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from database.models import ArtifactDB
+from database.models.artifact_migrations import MIGRATIONS
+
+
+def _prompt(text):
+    graph = {"6": {"class_type": "CLIPTextEncode", "inputs": {"text": text}}}
+    return [1, "x", graph, {}, ["9"]]
+
+
+@pytest.fixture
+def db_without_fts(tmp_path, monkeypatch):
+    """模拟不支持FTS5的SQLite：全文检索表建不出来"""
+    search = next(migration for migration in MIGRATIONS if migration.name == 'search')
+    monkeypatch.setattr(search, 'upgrade', lambda conn: None)
+    artifact_db = ArtifactDB(str(tmp_path / "artifacts.db"))
+    artifact_db.init_db()
+    yield artifact_db
+    artifact_db.close()
+
+
+def test_search_without_fts(db_without_fts):
+    db = db_without_fts
+    assert not db.fts_enabled
+    db.save_artifact("p1", prompt=_prompt("a quick brown fox"))
+    db.save_artifact("p2", prompt=_prompt("a lazy dog"))
+
+    assert [item["prompt_id"] for item in db.list_artifacts(q="fox")] == ["p1"]
+    assert [item["prompt_id"] for item in db.list_artifacts(q="a dog", summary=True)] == ["p2"]
+    assert db.count_artifacts(q="fox") == 1
+    assert db.count_artifacts(q="cat") == 0
+
+    db.delete_artifact(db.get_artifact_by_prompt_id("p1")["id"])
+    assert db.count_artifacts(q="fox") == 0
+
+
+def test_search_without_fts_backfills_legacy_rows(db_without_fts):
+    db = db_without_fts
+    with db.get_connection() as conn:
+        # 旧版本保存在prompt列中的记录
+        conn.execute(
+            "INSERT INTO comfyui_bt_artifact (prompt_id, prompt, created_ts) VALUES (?, ?, 1)",
+            ("legacy", json.dumps(_prompt("red fox in snow"))),
+        )
+    db.migrations.pending = {"documents", "search_text"}
+    with db.get_connection() as conn:
+        conn.execute("UPDATE comfyui_bt_migration SET last_id = 0, done = 0 WHERE name IN ('documents', 'search_text')")
+    db.migrations.run_backfills()
+
+    assert [item["prompt_id"] for item in db.list_artifacts(q="fox")] == ["legacy"]
+    assert db.count_artifacts(q="fox") == 1
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("torch")
+
+from nodes.remote_engine import POLL_MAX_ERRORS, RemoteBackend, TaskPoller  # noqa: E402
+
+
+class ScriptedBackend(RemoteBackend):
+    """按顺序返回预设的查询结果"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.queries = 0
+
+    async def query(self, task_id, request, settings):
+        self.queries += 1
+        return self.results.pop(0)
+
+
+def _wait(backend, timeout_ms=10000):
+    async def run():
+        return await TaskPoller().wait(backend, "task-1", {}, {}, 10, timeout_ms)
+    return asyncio.run(run())
+
+
+def test_query_errors_are_retried_until_task_finishes():
+    backend = ScriptedBackend([
+        (None, "HTTP错误: 502 - Bad Gateway"),
+        ({"status": "generating", "done": False}, None),
+        (None, "查询任务失败: Request Has Reached API Limit"),
+        ({"status": "done", "done": True, "image_urls": ["u"]}, None),
+    ])
+    state, error = _wait(backend)
+    assert error is None
+    assert state["image_urls"] == ["u"]
+    assert backend.queries == 4
+
+
+def test_consecutive_query_errors_fail_the_task():
+    backend = ScriptedBackend([(None, "HTTP错误: 500 - Internal Error")] * (POLL_MAX_ERRORS + 1))
+    state, error = _wait(backend)
+    assert state is None
+    assert error == "HTTP错误: 500 - Internal Error"
+    assert backend.queries == POLL_MAX_ERRORS + 1
+
+
+def test_definitive_task_failure_is_not_retried():
+    backend = ScriptedBackend([({"status": "not_found", "done": False, "error": "任务状态异常: not_found"}, None)])
+    state, error = _wait(backend)
+    assert error == "任务状态异常: not_found"
+    assert backend.queries == 1
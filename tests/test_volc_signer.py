@@ -0,0 +1,86 @@
+import datetime
+
+from nodes.volc_signer import VolcSigner, canonical_query, get_signer
+
+ACCESS_KEY = "AKLTtest"
+SECRET_KEY = "c2VjcmV0"
+ENDPOINT = "https://visual.volcengineapi.com"
+BODY = b'{"req_key": "jimeng_t2i_v31", "prompt": "cat", "seed": 42}'
+BODY_SHA256 = "4aa447c082d70820b144fb6376dc019c028cf80471435391813d806a0d836dbc"
+SUBMIT = {"Action": "CVSync2AsyncSubmitTask", "Version": "2022-08-31"}
+GET_RESULT = {"Action": "CVSync2AsyncGetResult", "Version": "2022-08-31"}
+
+# 固定的参考签名，由独立于插件的HMAC-SHA256 V4实现按火山引擎签名规范计算
+BEFORE_MIDNIGHT = datetime.datetime(2025, 1, 1, 23, 59, 59)
+AFTER_MIDNIGHT = datetime.datetime(2025, 1, 2, 0, 0, 1)
+SIG_SUBMIT_DAY1 = "5fb6f074fa8ff9986a54c0aff273518f5aec74abb52a85884531c303d0ab65b9"
+SIG_SUBMIT_DAY2 = "f0fb74d908113eb5d2f6ab7e47a784f08533149686e510840d10862e5e037f8b"
+SIG_GET_RESULT_DAY2 = "6fea6902fa8a382bb4766de7f9d0c1b7ac3824b4c79aea8522d8192c6d86b557"
+SIG_LOCAL_HOST_DAY2 = "685ff972a355065328735d52c49795e33251893bbe157c594a6b2a46602d0c55"
+
+
+def _settings(endpoint=ENDPOINT):
+    return {
+        "access_key": ACCESS_KEY,
+        "secret_key": SECRET_KEY,
+        "region": "cn-north-1",
+        "service": "cv",
+        "endpoint": endpoint,
+    }
+
+
+def _authorization(date_stamp, signature):
+    return (
+        f"HMAC-SHA256 Credential={ACCESS_KEY}/{date_stamp}/cn-north-1/cv/request, "
+        f"SignedHeaders=content-type;host;x-content-sha256;x-date, Signature={signature}"
+    )
+
+
+def test_reference_vector():
+    signer = VolcSigner(ACCESS_KEY, SECRET_KEY, "cn-north-1", "cv", ENDPOINT)
+    headers = signer.sign("POST", "/", SUBMIT, BODY, now=BEFORE_MIDNIGHT)
+    assert headers == {
+        "Content-Type": "application/json",
+        "Host": "visual.volcengineapi.com",
+        "X-Date": "20250101T235959Z",
+        "X-Content-Sha256": BODY_SHA256,
+        "Authorization": _authorization("20250101", SIG_SUBMIT_DAY1),
+    }
+
+
+def test_utc_day_rollover_rederives_signing_key():
+    signer = VolcSigner(ACCESS_KEY, SECRET_KEY, "cn-north-1", "cv", ENDPOINT)
+    day1 = signer.sign("POST", "/", SUBMIT, BODY, now=BEFORE_MIDNIGHT)
+    day2 = signer.sign("POST", "/", SUBMIT, BODY, now=AFTER_MIDNIGHT)
+    assert day1["Authorization"] == _authorization("20250101", SIG_SUBMIT_DAY1)
+    assert day2["X-Date"] == "20250102T000001Z"
+    assert day2["Authorization"] == _authorization("20250102", SIG_SUBMIT_DAY2)
+    # 跨天后缓存的派生密钥已替换，回到前一天的时间也要重新派生
+    again = signer.sign("POST", "/", SUBMIT, BODY, now=BEFORE_MIDNIGHT)
+    assert again["Authorization"] == day1["Authorization"]
+
+
+def test_query_change_does_not_reuse_cached_canonical_query():
+    signer = VolcSigner(ACCESS_KEY, SECRET_KEY, "cn-north-1", "cv", ENDPOINT)
+    submit = signer.sign("POST", "/", SUBMIT, BODY, now=AFTER_MIDNIGHT)
+    get_result = signer.sign("POST", "/", GET_RESULT, BODY, now=AFTER_MIDNIGHT)
+    assert submit["Authorization"] == _authorization("20250102", SIG_SUBMIT_DAY2)
+    assert get_result["Authorization"] == _authorization("20250102", SIG_GET_RESULT_DAY2)
+    assert signer.url(GET_RESULT) == f"{ENDPOINT}/?Action=CVSync2AsyncGetResult&Version=2022-08-31"
+
+
+def test_host_change_uses_new_signer():
+    remote = get_signer(_settings())
+    local = get_signer(_settings("http://127.0.0.1:8765/"))
+    assert local is not remote
+    assert get_signer(_settings()) is remote
+
+    remote.sign("POST", "/", SUBMIT, BODY, now=AFTER_MIDNIGHT)
+    headers = local.sign("POST", "/", SUBMIT, BODY, now=AFTER_MIDNIGHT)
+    assert headers["Host"] == "127.0.0.1:8765"
+    assert headers["Authorization"] == _authorization("20250102", SIG_LOCAL_HOST_DAY2)
+    assert local.url(SUBMIT) == "http://127.0.0.1:8765/?Action=CVSync2AsyncSubmitTask&Version=2022-08-31"
+
+
+def test_canonical_query_encoding():
+    assert canonical_query({"b": "x y", "a": "中", "c": None, "d": "-_.~/"}) == "a=%E4%B8%AD&b=x%20y&d=-_.~%2F"
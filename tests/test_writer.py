@@ -0,0 +1,20 @@
+from database.writer import ArtifactWriter
+
+
+def test_bad_write_does_not_drop_batch(db):
+    writer = ArtifactWriter(db)
+    committed = []
+    writer.add_listener(committed.extend)
+    writer.start()
+    writer.save("good-1", meta={"n": 1})
+    # 无法序列化为JSON，这条写入会失败
+    writer.save("bad", meta={"n": object()})
+    writer.save("good-2", meta={"n": 2})
+    writer.update("good-1", result_status="1")
+    assert writer.flush(5)
+    writer.stop()
+
+    assert db.get_artifact_by_prompt_id("good-1")["result_status"] == "1"
+    assert db.get_artifact_by_prompt_id("good-2")["meta"] == {"n": 2}
+    assert db.get_artifact_by_prompt_id("bad") is None
+    assert sorted(committed) == ["good-1", "good-2"]
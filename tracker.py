@@ -0,0 +1,277 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import server
+from .database.manager import db_manager
+
+prompt_server = server.PromptServer.instance
+
+# 执行生命周期消息
+LIFECYCLE_EVENTS = frozenset((
+    'execution_start', 'execution_success', 'execution_error', 'execution_interrupted',
+))
+# 登记前就已完成的prompt最多保留的数量（缓存命中的任务可能在提交接口返回前就执行完）
+FINISHED_BACKLOG = 1000
+# 处理中记录的对账：启动后延迟、周期（秒），以及每批扫描的记录数
+RECONCILE_DELAY = 5
+RECONCILE_INTERVAL = 300
+RECONCILE_BATCH_SIZE = 500
+# 创建不久的记录即使不在队列和历史记录中也暂不判定过期（秒）
+RECONCILE_GRACE = 60
+
+
+def result_status_of(status) -> str:
+    """ComfyUI历史记录中的status转换为记录的result_status：1-已完成 2-错误"""
+    if isinstance(status, dict) and status.get('status_str') == 'error':
+        return '2'
+    return '1'
+
+
+def queue_snapshot(prompt_queue, prompt_ids):
+    """一次加锁读取队列中的prompt_id，以及给定prompt的历史记录
+
+    Returns:
+        (执行中的prompt_id集合, 排队中的prompt_id集合, {prompt_id: 历史记录})
+    """
+    mutex = getattr(prompt_queue, 'mutex', None)
+    if mutex is None:
+        # 没有内部结构时退化为公开接口
+        queue_running, queue_pending = prompt_queue.get_current_queue()[:2]
+        running = {item[1] for item in queue_running}
+        pending = {item[1] for item in queue_pending}
+        history = {}
+        for prompt_id in prompt_ids:
+            if prompt_id not in running and prompt_id not in pending:
+                history.update(prompt_queue.get_history(prompt_id=prompt_id) or {})
+        return running, pending, history
+    with mutex:
+        running = {item[1] for item in prompt_queue.currently_running.values()}
+        pending = {item[1] for item in prompt_queue.queue}
+        found = {
+            prompt_id: prompt_queue.history[prompt_id]
+            for prompt_id in prompt_ids if prompt_id in prompt_queue.history
+        }
+    # 只复制命中的历史记录，避免get_history()复制全部历史
+    return running, pending, {prompt_id: copy.deepcopy(entry) for prompt_id, entry in found.items()}
+
+
+class PromptTracker:
+    """跟踪prompt的执行并在完成时更新记录
+
+    通过包装 send_sync 接收执行生命周期消息，通过包装 prompt_queue.task_done 获得历史记录写入的时机，
+    每个prompt只在完成时更新一次记录，不做任何轮询。
+    """
+
+    def __init__(self, server_instance, writer):
+        self.server = server_instance
+        self.writer = writer
+        self._lock = threading.Lock()
+        # 等待完成的prompt
+        self._tracked = set()
+        # 正在执行的prompt
+        self._running = set()
+        # 登记前就已完成的prompt
+        self._finished = OrderedDict()
+        # 状态变化的订阅者 callback(prompt_id, state)，在ComfyUI的执行线程中调用
+        self._listeners = []
+        self._send_sync_installed = False
+        self._queue_installed = False
+
+    def install(self) -> None:
+        """挂接send_sync和task_done，可重复调用"""
+        if not self._send_sync_installed:
+            original_send_sync = self.server.send_sync
+
+            def send_sync(event, data, sid=None):
+                original_send_sync(event, data, sid)
+                if event in LIFECYCLE_EVENTS:
+                    self._on_lifecycle(event, data)
+
+            self.server.send_sync = send_sync
+            self._send_sync_installed = True
+
+        prompt_queue = getattr(self.server, 'prompt_queue', None)
+        if not self._queue_installed and prompt_queue is not None:
+            original_task_done = prompt_queue.task_done
+
+            def task_done(item_id, *args, **kwargs):
+                # task_done会把任务移出currently_running，先取出prompt_id
+                item = prompt_queue.currently_running.get(item_id)
+                result = original_task_done(item_id, *args, **kwargs)
+                if item is not None:
+                    self._on_task_done(item[1])
+                return result
+
+            prompt_queue.task_done = task_done
+            self._queue_installed = True
+
+    def track(self, prompt_id: str) -> None:
+        """登记一个已提交的prompt，完成时更新其记录"""
+        if not self._queue_installed:
+            self.install()
+        with self._lock:
+            finished = self._finished.pop(prompt_id, False)
+            if not finished:
+                self._tracked.add(prompt_id)
+        if finished:
+            self.finalize(prompt_id)
+        else:
+            self._publish(prompt_id, 'pending')
+
+    def subscribe(self, callback) -> None:
+        """订阅prompt状态变化：pending（已登记）、running（开始执行）、done（历史记录已写入）"""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _publish(self, prompt_id: str, state: str) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(prompt_id, state)
+            except Exception as e:
+                logging.error(f"prompt状态通知失败: {str(e)}")
+
+    def untrack(self, prompt_id: str) -> None:
+        """不再跟踪（任务已从队列中删除等）"""
+        with self._lock:
+            self._tracked.discard(prompt_id)
+
+    def is_tracked(self, prompt_id: str) -> bool:
+        return prompt_id in self._tracked
+
+    def is_running(self, prompt_id: str) -> bool:
+        return prompt_id in self._running
+
+    def _on_lifecycle(self, event: str, data) -> None:
+        prompt_id = data.get('prompt_id') if isinstance(data, dict) else None
+        if not prompt_id:
+            return
+        if event == 'execution_start':
+            self._running.add(prompt_id)
+            logging.debug(f"Prompt {prompt_id} 开始执行")
+            self._publish(prompt_id, 'running')
+        else:
+            self._running.discard(prompt_id)
+
+    def _on_task_done(self, prompt_id: str) -> None:
+        """任务结束，历史记录已写入"""
+        self._running.discard(prompt_id)
+        with self._lock:
+            tracked = prompt_id in self._tracked
+            self._tracked.discard(prompt_id)
+            if not tracked:
+                self._finished[prompt_id] = True
+                while len(self._finished) > FINISHED_BACKLOG:
+                    self._finished.popitem(last=False)
+        if tracked:
+            self.finalize(prompt_id)
+        self._publish(prompt_id, 'done')
+
+    def finalize(self, prompt_id: str, prompt_history: dict = None) -> None:
+        """从历史记录读取结果，放入写入队列更新记录"""
+        try:
+            if prompt_history is None:
+                history = self.server.prompt_queue.get_history(prompt_id=prompt_id) or {}
+                prompt_history = history.get(prompt_id)
+            if not prompt_history:
+                logging.error(f"Prompt {prompt_id} 历史生成记录没有找到...")
+                return
+            status_data = prompt_history.get('status') or {}
+            execution_status = result_status_of(status_data)
+            self.writer.update(
+                prompt_id=prompt_id,
+                meta=prompt_history.get('meta'),
+                outputs=prompt_history.get('outputs'),
+                status=status_data,
+                prompt=prompt_history.get('prompt'),
+                result_status=execution_status
+            )
+            logging.info(f"Prompt {prompt_id} 数据已加入更新队列，执行状态: {execution_status}")
+        except Exception as e:
+            logging.error(f"更新prompt执行结果失败: {str(e)}")
+
+
+class PromptReconciler:
+    """对账处理中的记录
+
+    ComfyUI重启或任务被删除后，这些记录不会再收到完成事件。启动时和之后每隔一段时间，
+    分批扫描result_status为0的记录，每批只加锁读取一次队列和历史记录：
+    仍在队列中的交给跟踪器，已有历史记录的按结果更新，都没有的标记为过期失败。
+    """
+
+    def __init__(self, tracker: PromptTracker, artifact_db, writer):
+        self.tracker = tracker
+        self.artifact_db = artifact_db
+        self.writer = writer
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="bt-artifact-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        delay = RECONCILE_DELAY
+        while not self._stop.wait(delay):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logging.error(f"[Bt-ArtifactGround] 处理中记录对账失败: {str(e)}")
+            delay = RECONCILE_INTERVAL
+
+    def reconcile(self) -> dict:
+        """对账一轮
+
+        Returns:
+            dict: 各类处理结果的数量
+        """
+        if getattr(self.tracker.server, 'prompt_queue', None) is None:
+            return {}
+        counts = {'queued': 0, 'finished': 0, 'expired': 0}
+        expire_before = time.time() - RECONCILE_GRACE
+        after_id = 0
+        while True:
+            rows = self.artifact_db.list_processing_prompts(after_id, RECONCILE_BATCH_SIZE)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            running, pending, history = queue_snapshot(self.tracker.server.prompt_queue, [row[1] for row in rows])
+            queued = running | pending
+            for _, prompt_id, created_ts in rows:
+                if prompt_id in queued:
+                    if not self.tracker.is_tracked(prompt_id):
+                        self.tracker.track(prompt_id)
+                    counts['queued'] += 1
+                elif prompt_id in history:
+                    self.tracker.finalize(prompt_id, history[prompt_id])
+                    counts['finished'] += 1
+                elif created_ts is None or created_ts < expire_before:
+                    self.tracker.untrack(prompt_id)
+                    self.writer.update(
+                        prompt_id=prompt_id,
+                        status={'status_str': 'expired', 'completed': False, 'messages': []},
+                        result_status='2'
+                    )
+                    counts['expired'] += 1
+        if counts['finished'] or counts['expired']:
+            logging.info(f"[Bt-ArtifactGround] 处理中记录对账: 已完成{counts['finished']}条，"
+                         f"已过期{counts['expired']}条，仍在队列{counts['queued']}条")
+        return counts
+
+
+prompt_tracker = PromptTracker(prompt_server, db_manager.writer)
+prompt_tracker.install()
+prompt_reconciler = PromptReconciler(prompt_tracker, db_manager.artifact, db_manager.writer)
+prompt_reconciler.start()